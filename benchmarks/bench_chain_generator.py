@@ -0,0 +1,84 @@
+"""
+Benchmark of the chain generation engines, in beads per second. The fortran path is timed as
+PolymerSimulation runs it (def.chain2 and ./chain, which writes the data file), and the
+numpy path as ChainGenerator plus write_lammps_data. Usage::
+
+  python benchmarks/bench_chain_generator.py [num_replicas]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+pathto = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(pathto)
+
+from lib.chain_generator import ChainGenerator
+from lib.data_file import write_lammps_data
+
+SIZES = [(20, 168), (200, 168), (1000, 168), (1000, 1000)]
+RHO_STAR = 0.85
+
+
+def fortran_chains(nchain, nmonomers, num_replicas):
+    for i in range(num_replicas):
+        with open("def.chain2", "w") as fdata:
+            fdata.write("Polymer chain definition\n\n")
+            fdata.write("{}     rhostar\n".format(RHO_STAR))
+            fdata.write("{}     random # seed\n".format(np.random.randint(10000, 100000000)))
+            fdata.write("1     # of sets of chains\n")
+            fdata.write("0     molecule tag rule\n\n")
+            fdata.write("{}     number of chains\n".format(nchain))
+            fdata.write("{}     monomers/chain\n".format(nmonomers))
+            fdata.write("1     type of monomers\n")
+            fdata.write("1     type of bonds\n")
+            fdata.write("0.97     distance between monomers\n")
+            fdata.write("1.02     no distance less than this from site i-1 to i+1\n")
+        os.system("./chain < def.chain2 > fortran_"+str(i)+".data")
+
+
+def numpy_chains(nchain, nmonomers, num_replicas):
+    generator = ChainGenerator(nchain, nmonomers, RHO_STAR, seed=np.random.randint(10000, 100000000))
+    positions, molecule, images = generator.generate(num_replicas)
+    types = np.ones(generator.natoms, dtype=int)
+    bonds = generator.bonds()
+    for i in range(num_replicas):
+        write_lammps_data("numpy_"+str(i)+".data", generator.box_side, positions[i], molecule,
+                          types, images[i], bonds, 2)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    num_replicas = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp(prefix="bench_chain_")
+    os.chdir(workdir)
+    try:
+        have_fortran = shutil.which("gfortran") is not None
+        if have_fortran:
+            compile_time = timed(subprocess.check_call, ["gfortran", pathto+"/lib/chain.f", "-o", "chain"])
+            print("gfortran compile: {:.3f} s (paid on every PolymerSimulation)".format(compile_time))
+        else:
+            print("gfortran not found, timing only the numpy engine")
+
+        print("{:>8} {:>10} {:>12} {:>16} {:>16}".format("nchain", "nmonomers", "beads", "numpy beads/s", "fortran beads/s"))
+        for nchain, nmonomers in SIZES:
+            beads = nchain * nmonomers * num_replicas
+            numpy_rate = beads / timed(numpy_chains, nchain, nmonomers, num_replicas)
+            fortran_rate = beads / timed(fortran_chains, nchain, nmonomers, num_replicas) if have_fortran else float("nan")
+            print("{:>8} {:>10} {:>12} {:>16.3e} {:>16.3e}".format(nchain, nmonomers, beads, numpy_rate, fortran_rate))
+    finally:
+        os.chdir(pathto)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Benchmark of the space-filling-curve atom ordering (system parameter "atom_ordering"). For large
+systems it writes the data file in the default order (chain by chain, then the obstacles) and
+along the Morton and Hilbert curves, and prints the time to order and write it and the locality
+of the file: the mean distance, in rows of the data file, between atoms that are neighbors, and
+the fraction of neighbors more than FAR rows apart. Chains written one after the other are
+already local in dilute systems, where the neighbors of a bead are mostly its own chain; the
+curves pay off in dense systems, where most neighbors belong to other chains.
+
+When a LAMMPS executable is given or found in the PATH, each file is also read by LAMMPS, which
+reports the read_data time and the time of a full neighbor build, once with the atom sorting
+of LAMMPS off, so that the atoms stay in file order, and once with the atom_modify sort settings
+emitted by PolymerSimulation. Usage::
+
+  python benchmarks/bench_ordering.py [--lmp "mpirun -np 4 lmp"] [--history FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+pathto = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(pathto)
+
+from lib.cell_list import CellList
+from lib.data_file import read_lammps_data
+from lib.lammps_generator import PolymerSimulation
+
+SIZES = [(1000, 168), (1000, 1000), (4000, 1000)]
+RHO_REAL = [0.3, 30.]
+ORDERINGS = [None, "morton", "hilbert"]
+SAMPLE = 100000
+FAR = 1024
+
+BASE = {
+    "sigma0": 0.626,
+    "mass0": 44,
+    "eps0": 1.0,
+    "rho_real": 0.3,
+    "phi_hs": 0.05,
+    "filename": "bench",
+    "type_simulation": True,
+    "number_of_steps": 10000,
+    "number_of_steps_equilibration": 10000,
+    "low_attraction": 0.5,
+    "seed": 2020,
+    "num_files": 1,
+    "instrumentation": True,
+}
+
+LAMMPS_SCRIPT = """units lj
+atom_style molecular
+boundary p p p
+atom_modify sort {sort_every} {binsize}
+neighbor {skin} bin
+neigh_modify every 1 delay 0 check no
+read_data {data_file}
+mass * 1.0
+pair_style lj/cut {cutoff}
+pair_coeff * * 1.0 1.0
+bond_style harmonic
+bond_coeff * 30.0 0.97
+run 1
+"""
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "-C", pathto, "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_lammps():
+    for name in ["lmp", "lmp_serial", "lmp_mpi"]:
+        if shutil.which(name):
+            return name
+    return None
+
+
+def row_locality(data_file, cutoff, rng):
+    """Mean row distance between neighbor atoms, and the fraction above FAR, from a sample of rows."""
+    data = read_lammps_data(data_file)
+    # rows of the file, since read_lammps_data sorts the atoms by ID
+    with open(data_file, "rb") as fdata:
+        text = fdata.read()
+    start = text.index(b"Atoms") + len(b"Atoms\n\n")
+    ids = np.fromstring(text[start:].split(b"\n\n")[0], sep=" ").reshape(len(data["types"]), -1)[:, 0].astype(np.int64)
+    row = np.empty(len(ids), dtype=np.int64)
+    row[ids - 1] = np.arange(len(ids))
+
+    box_side = data["hi"][0] - data["lo"][0]
+    cells = CellList(box_side, cutoff)
+    cells.insert(data["positions"])
+    sample = rng.choice(len(ids), min(SAMPLE, len(ids)), replace=False)
+    query_index, point_index, _ = cells.query(data["positions"][sample], cutoff)
+    others = point_index != sample[query_index]
+    gaps = np.abs(row[sample[query_index[others]]] - row[point_index[others]])
+    return float(np.mean(gaps)), float(np.mean(gaps > FAR))
+
+
+def run_lammps(command, data_file, sort_every, binsize, skin, cutoff):
+    with open("bench_ordering.in", "w") as fscript:
+        fscript.write(LAMMPS_SCRIPT.format(sort_every=sort_every, binsize=binsize, skin=skin, data_file=data_file,
+                                           cutoff=cutoff))
+    output = subprocess.run(shlex.split(command) + ["-in", "bench_ordering.in", "-log", "none"],
+                            capture_output=True, text=True).stdout
+    read = re.search(r"read_data CPU = ([\d.eE+-]+) seconds", output)
+    # columns of the timing breakdown: min, avg, max, %varavg, %total
+    neigh = re.search(r"^Neigh\s*\|\s*[\d.eE+-]+\s*\|\s*([\d.eE+-]+)", output, re.MULTILINE)
+    return {"read_data": float(read.group(1)) if read else None, "neighbor_build": float(neigh.group(1)) if neigh else None}
+
+
+def run_point(nchain, nmonomers, rho_real, ordering, lammps, rng):
+    parameters = dict(BASE, nchain=nchain, nmonomers=nmonomers, rho_real=rho_real)
+    if ordering is not None:
+        parameters["atom_ordering"] = ordering
+    start = time.perf_counter()
+    simulation = PolymerSimulation(parameters, pathto)
+    seconds = time.perf_counter() - start
+    summary = simulation.instrumentation.summary()
+    data_file = "bench_poly_input_0.data"
+    skin = simulation.performance_profile.settings["skin"]
+    cutoff = simulation.cut11
+    mean_gap, far = row_locality(data_file, cutoff + skin, rng)
+    result = {
+        "nchain": nchain,
+        "nmonomers": nmonomers,
+        "rho_real": rho_real,
+        "ordering": ordering,
+        "natoms": simulation.nchain * simulation.nmonomers + simulation.n_hs,
+        "seconds": seconds,
+        "atom_ordering": summary.get("atom_ordering", {}).get("seconds", 0.),
+        "write_data": summary["write_data"]["seconds"],
+        "mean_row_gap": mean_gap,
+        "far_fraction": far,
+    }
+    if lammps is not None:
+        binsize = round((cutoff + skin) / 2., 4)
+        if simulation.atom_ordering is not None:
+            binsize = simulation.atom_ordering["binsize"]
+        result["lammps_unsorted"] = run_lammps(lammps, data_file, 0, 0.0, skin, cutoff)
+        result["lammps_sorted"] = run_lammps(lammps, data_file, 1000, binsize, skin, cutoff)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lmp", default=find_lammps(), help="command that runs LAMMPS, e.g. \"mpirun -np 4 lmp\"")
+    parser.add_argument("--history", default="ordering_history.jsonl")
+    arguments = parser.parse_args()
+    history = os.path.abspath(arguments.history)
+    if arguments.lmp is None:
+        print("no LAMMPS executable found: only the Python side is measured")
+
+    rng = np.random.default_rng(2020)
+    workdir = tempfile.mkdtemp(prefix="bench_ordering_")
+    os.chdir(workdir)
+    results = []
+    try:
+        print("{:>8} {:>10} {:>9} {:>8} {:>10} {:>9} {:>9} {:>10} {:>9} {:>9} {:>9}".format(
+            "nchain", "nmonomers", "rho_real", "order", "natoms", "order s", "write s", "mean gap", "far", "read s",
+            "neigh s"))
+        for nchain, nmonomers in SIZES:
+            for rho_real in RHO_REAL:
+                for ordering in ORDERINGS:
+                    result = run_point(nchain, nmonomers, rho_real, ordering, arguments.lmp, rng)
+                    results.append(result)
+                    lammps = result.get("lammps_unsorted", {})
+                    print("{:>8} {:>10} {:>9} {:>8} {:>10} {:>9.3f} {:>9.3f} {:>10.0f} {:>9.2%} {:>9} {:>9}".format(
+                        nchain, nmonomers, rho_real, str(ordering), result["natoms"], result["atom_ordering"],
+                        result["write_data"], result["mean_row_gap"], result["far_fraction"],
+                        str(lammps.get("read_data", "-")), str(lammps.get("neighbor_build", "-"))))
+                    for name in os.listdir("."):
+                        if os.path.isfile(name):
+                            os.remove(name)
+    finally:
+        os.chdir(pathto)
+        shutil.rmtree(workdir)
+
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "lammps": arguments.lmp,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(history, "a") as fhistory:
+        fhistory.write(json.dumps(entry) + "\n")
+    print("appended to {}".format(history))
+
+
+if __name__ == "__main__":
+    main()
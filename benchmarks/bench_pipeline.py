@@ -0,0 +1,122 @@
+"""
+Scaling benchmark of the whole input generation of PolymerSimulation, stage by stage. It sweeps
+nchain x nmonomers, and phi_hs at the largest size, with the instrumentation enabled, and prints
+the time of every stage, the generation throughput in beads per second and the peak memory.
+Every run is appended to a JSON lines history, with the git commit, so that the scaling can be
+followed over time. Usage::
+
+  python benchmarks/bench_pipeline.py [--engine numpy|fortran] [--replicas N] [--history FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+pathto = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(pathto)
+
+from lib.lammps_generator import PolymerSimulation
+
+SIZES = [(20, 168), (200, 168), (1000, 168), (1000, 1000)]
+PHI_HS = [0.0, 0.05, 0.1, 0.2]
+
+BASE = {
+    "sigma0": 0.626,
+    "mass0": 44,
+    "eps0": 1.0,
+    "rho_real": 0.3,
+    "filename": "bench",
+    "type_simulation": True,
+    "number_of_steps": 10000,
+    "number_of_steps_equilibration": 10000,
+    "low_attraction": 0.5,
+    "seed": 2020,
+    "instrumentation": True,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "-C", pathto, "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_point(nchain, nmonomers, phi_hs, engine, num_replicas):
+    parameters = dict(BASE, nchain=nchain, nmonomers=nmonomers, phi_hs=phi_hs, num_files=num_replicas,
+                      chain_engine=engine)
+    if engine == "fortran":
+        parameters["obstacle_placement"] = "lammps"
+    start = time.perf_counter()
+    simulation = PolymerSimulation(parameters, pathto)
+    seconds = time.perf_counter() - start
+    summary = simulation.instrumentation.summary()
+    beads = nchain * nmonomers * num_replicas
+    return {
+        "nchain": nchain,
+        "nmonomers": nmonomers,
+        "phi_hs": phi_hs,
+        "n_hs": simulation.n_hs,
+        "replicas": num_replicas,
+        "seconds": seconds,
+        "beads_per_second": beads / seconds,
+        "peak_memory": max(stage["peak_memory"] for stage in summary.values()),
+        "stages": summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engine", default="numpy", choices=["numpy", "fortran"])
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--history", default="pipeline_history.jsonl")
+    arguments = parser.parse_args()
+    history = os.path.abspath(arguments.history)
+
+    points = [(nchain, nmonomers, PHI_HS[1]) for nchain, nmonomers in SIZES]
+    points += [(SIZES[-1][0], SIZES[-1][1], phi_hs) for phi_hs in PHI_HS if phi_hs != PHI_HS[1]]
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)
+    results = []
+    try:
+        print("{:>8} {:>10} {:>7} {:>9} {:>10} {:>14} {:>12}  slowest stage".format(
+            "nchain", "nmonomers", "phi_hs", "n_hs", "seconds", "beads/s", "peak MB"))
+        for nchain, nmonomers, phi_hs in points:
+            result = run_point(nchain, nmonomers, phi_hs, arguments.engine, arguments.replicas)
+            results.append(result)
+            slowest = max(result["stages"].items(), key=lambda item: item[1]["seconds"])
+            print("{:>8} {:>10} {:>7} {:>9} {:>10.3f} {:>14.3e} {:>12.1f}  {} ({:.0%})".format(
+                nchain, nmonomers, phi_hs, result["n_hs"], result["seconds"], result["beads_per_second"],
+                result["peak_memory"] / 2.**20, slowest[0], slowest[1]["seconds"] / result["seconds"]))
+            for name in os.listdir("."):
+                if os.path.isfile(name):
+                    os.remove(name)
+    finally:
+        os.chdir(pathto)
+        shutil.rmtree(workdir)
+
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "engine": arguments.engine,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(history, "a") as fhistory:
+        fhistory.write(json.dumps(entry) + "\n")
+    print("appended to {}".format(history))
+
+
+if __name__ == "__main__":
+    main()
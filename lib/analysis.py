@@ -0,0 +1,201 @@
+import json
+import os
+import re
+
+import numpy as np
+
+
+OUTPUTS = {
+    "thermo": "_thermo_output_",
+    "msd_ficoll": "_msd_ficoll_",
+    "msd_polymer": "_msd_polymer_",
+    "com_poly": "_com_poly_",
+}
+
+
+def _header(text):
+    # the comment lines at the top of the file, and the data after them
+    comments = []
+    start = 0
+    while text.startswith(b"#", start):
+        end = text.find(b"\n", start)
+        end = len(text) if end < 0 else end
+        comments.append(text[start + 1:end].decode().strip())
+        start = end + 1
+    return comments, text[start:]
+
+
+def _tokens(data, nlines, per_line, what):
+    # whole block of numbers at once; fromstring stops at the first token it cannot parse
+    values = np.fromstring(data, sep=" ") if data.strip() else np.empty(0)
+    if values.size < (nlines - 1) * per_line:
+        raise ValueError("{}: could not parse {} values, only {}".format(what, nlines * per_line, values.size))
+    return values
+
+
+def parse_ave_time(path):
+    """
+    Parses a file written by fix ave/time, in scalar or vector mode, or by fix print with a
+    title line. The numbers of the whole file are tokenized at once, and an incomplete last
+    row or block, as in the output of a running simulation, is dropped.
+
+    Returns
+    -------
+    steps
+        Array with the step of every row (scalar mode) or block (vector mode).
+    values
+        Array of shape (nsteps, ncolumns) in scalar mode, or (nsteps, nrows, ncolumns) in
+        vector mode, without the row index.
+    columns
+        Names of the columns, from the header.
+    """
+    with open(path, "rb") as fdata:
+        text = fdata.read()
+    comments, data = _header(text)
+    # comment lines in the middle of the file, e.g. from a restarted run appending to it
+    if b"\n#" in data:
+        data = re.sub(rb"(?m)^#.*\n?", b"", data)
+    names = comments[-1].split() if comments else []
+    nlines = data.count(b"\n") + (0 if data.endswith(b"\n") or not data else 1)
+
+    vector = len(comments) >= 3 and comments[-2].split() == ["TimeStep", "Number-of-rows"]
+    if not vector:
+        ncolumns = len(names) if names else len(data[:data.find(b"\n")].split())
+        values = _tokens(data, nlines, ncolumns, path)
+        values = values[:values.size - values.size % ncolumns].reshape(-1, ncolumns)
+        return values[:, 0].astype(np.int64), values[:, 1:], names[1:]
+
+    ncolumns = len(names)
+    values = _tokens(data, nlines, 0, path)
+    if values.size < 2:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0, ncolumns - 1)), names[1:]
+    nrows = int(values[1])
+    block = 2 + nrows * ncolumns
+    nblocks = values.size // block
+    blocks = values[:nblocks * block].reshape(nblocks, block)
+    if nblocks > 0 and np.any(blocks[:, 1] != nrows):
+        return _parse_ragged(values, ncolumns, names, path)
+    if values.size < (nlines // (nrows + 1) - 1) * block:
+        raise ValueError("{}: could not parse every block".format(path))
+    rows = blocks[:, 2:].reshape(nblocks, nrows, ncolumns)
+    return blocks[:, 0].astype(np.int64), rows[:, :, 1:], names[1:]
+
+
+def _parse_ragged(values, ncolumns, names, path):
+    # blocks with different numbers of rows (e.g. chunks that appear or vanish) are padded with nan
+    starts = []
+    position = 0
+    while position + 2 <= values.size:
+        nrows = int(values[position + 1])
+        if position + 2 + nrows * ncolumns > values.size:
+            break
+        starts.append((position, nrows))
+        position += 2 + nrows * ncolumns
+    largest = max(nrows for _, nrows in starts)
+    rows = np.full((len(starts), largest, ncolumns - 1), np.nan)
+    steps = np.empty(len(starts), dtype=np.int64)
+    for k, (position, nrows) in enumerate(starts):
+        steps[k] = values[position]
+        rows[k, :nrows] = values[position + 2:position + 2 + nrows * ncolumns].reshape(nrows, ncolumns)[:, 1:]
+    return steps, rows, names[1:]
+
+
+def read_ave_time(path, cache_dir=None):
+    """
+    Reads a fix ave/time file, as parse_ave_time, through an on-disk cache: the arrays are
+    saved as .npy files in cache_dir (by default .analysis_cache next to the file) and later
+    reads memory-map them, as long as the size and modification time of the file have not
+    changed.
+
+    Parameters
+    ----------
+    path
+        Name of the file.
+    cache_dir
+        Directory of the cache, or False to parse the file without caching.
+    """
+    if cache_dir is False:
+        return parse_ave_time(path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), ".analysis_cache")
+    stat = os.stat(path)
+    stem = os.path.join(cache_dir, os.path.basename(path))
+    try:
+        with open(stem + ".json") as fmeta:
+            meta = json.load(fmeta)
+        if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+            return (np.load(stem + ".steps.npy", mmap_mode="r"), np.load(stem + ".values.npy", mmap_mode="r"),
+                    meta["columns"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    steps, values, columns = parse_ave_time(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # the arrays first and the metadata last, each written under a temporary name, so that a
+    # cache entry is never read half written
+    for name, array in [("steps", steps), ("values", values)]:
+        with open(stem + "." + name + ".tmp", "wb") as farray:
+            np.save(farray, array)
+        os.replace(stem + "." + name + ".tmp", stem + "." + name + ".npy")
+    with open(stem + ".json.tmp", "w") as fmeta:
+        json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "columns": columns}, fmeta)
+    os.replace(stem + ".json.tmp", stem + ".json")
+    return steps, values, columns
+
+
+def read_replicas(filename, output, num_files, directory=".", cache_dir=None):
+    """
+    Reads one output of the num_files replicas of a simulation and combines them.
+
+    Parameters
+    ----------
+    filename
+        The "filename" of the system parameters.
+    output
+        "thermo", "msd_ficoll", "msd_polymer" or "com_poly".
+    num_files
+        Number of replicas.
+    directory
+        Directory with the output files.
+    cache_dir
+        As in read_ave_time.
+
+    Returns
+    -------
+    combined
+        A dictionary with the steps, the column names, the values of every replica stacked in
+        an array with a leading replica axis, and their mean, standard deviation and standard
+        error over the replicas. Replicas are cut to the steps they all have.
+    """
+    read = [read_ave_time(os.path.join(directory, str(filename) + OUTPUTS[output] + str(i) + ".dat"), cache_dir)
+            for i in range(num_files)]
+    nsteps = min(len(steps) for steps, _, _ in read)
+    steps = np.asarray(read[0][0][:nsteps])
+    for other, _, _ in read[1:]:
+        if not np.array_equal(other[:nsteps], steps):
+            raise ValueError("the replicas of {} were written at different steps".format(filename))
+    replicas = np.stack([values[:nsteps] for _, values, _ in read])
+    std = replicas.std(axis=0, ddof=1) if num_files > 1 else np.zeros(replicas.shape[1:])
+    return {
+        "steps": steps,
+        "columns": read[0][2],
+        "replicas": replicas,
+        "mean": replicas.mean(axis=0),
+        "std": std,
+        "sem": std / np.sqrt(num_files),
+    }
+
+
+def read_equilibration_report(path):
+    """
+    Reads the report written by the adaptive push-off and equilibration: a dictionary from
+    stage to the number of steps it used and its cap.
+    """
+    report = {}
+    with open(path) as freport:
+        for line in freport:
+            if line.startswith("#") or not line.strip():
+                continue
+            stage, used, cap = line.split()
+            report[stage] = {"steps_used": int(used), "max_steps": int(cap)}
+    return report
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class CellList:
+    """
+    This is the class CellList. It is a periodic cell list for a cubic box centered at the
+    origin, where only the occupied cells are stored: the cell key of every point is kept in
+    a sorted array, so inserting points and finding the neighbors of a batch of points are
+    both vectorized, and memory does not depend on the number of cells. This matters for the
+    dilute systems generated here, where the box can hold millions of empty cells.
+
+
+    Parameters
+    ----------
+    box_side
+        Side of the cubic box.
+    cutoff
+        Largest distance that will be queried. The cells are at least this wide.
+    """
+
+    def __init__(self, box_side, cutoff):
+        self.box_side = box_side
+        self.ncell = max(1, int(box_side // cutoff))
+        self.cell_size = box_side / self.ncell
+        self.cutoff = cutoff
+        # with less than 3 cells per side the 27 neighbor cells are not all distinct
+        shifts = np.unique(np.arange(-1, 2) % self.ncell)
+        sx, sy, sz = np.meshgrid(shifts, shifts, shifts, indexing="ij")
+        self.shifts = np.column_stack((sx.ravel(), sy.ravel(), sz.ravel()))
+        self.points = np.empty((0, 3))
+        self.keys = np.empty(0, dtype=np.int64)
+        self.order = np.empty(0, dtype=np.int64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __cells(self, points):
+        cells = np.floor((points + self.box_side / 2.) / self.cell_size).astype(np.int64)
+        return cells % self.ncell
+
+    def __key(self, cells):
+        return cells[..., 0] + self.ncell * (cells[..., 1] + self.ncell * cells[..., 2])
+
+    def insert(self, points):
+        """Adds points to the cell list. They are numbered in order of insertion."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if self.size + len(points) > len(self.points):
+            grown = np.empty((max(2 * len(self.points), self.size + len(points)), 3))
+            grown[:self.size] = self.points[:self.size]
+            self.points = grown
+        self.points[self.size:self.size + len(points)] = points
+
+        keys = self.__key(self.__cells(points))
+        sort = np.argsort(keys, kind="stable")
+        where = np.searchsorted(self.keys, keys[sort], side="right")
+        self.keys = np.insert(self.keys, where, keys[sort])
+        self.order = np.insert(self.order, where, self.size + sort)
+        self.size += len(points)
+
+    def query(self, points, radius, block=65536):
+        """
+        Finds every stored point closer than radius to each of the given points, using the
+        minimum image convention.
+
+        Returns
+        -------
+        query_index
+            Index of the query point of each pair.
+        point_index
+            Index of the stored point of each pair.
+        distance
+            Distance of each pair.
+        """
+        if radius > self.cell_size and self.ncell > 2:
+            raise ValueError("query radius {} larger than the cell size {}".format(radius, self.cell_size))
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        found = [], [], []
+        for start in range(0, len(points), block):
+            pairs = self.__query_block(points[start:start + block], radius)
+            found[0].append(pairs[0] + start)
+            found[1].append(pairs[1])
+            found[2].append(pairs[2])
+        if not found[0]:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        return tuple(np.concatenate(column) for column in found)
+
+    def __query_block(self, points, radius):
+        cells = self.__cells(points)
+        neighbor_keys = self.__key((cells[:, None, :] + self.shifts[None, :, :]) % self.ncell).ravel()
+        first = np.searchsorted(self.keys, neighbor_keys, side="left")
+        counts = np.searchsorted(self.keys, neighbor_keys, side="right") - first
+
+        # flat list of (query, candidate) pairs, one per stored point in a neighbor cell
+        total = int(counts.sum())
+        query_index = np.repeat(np.arange(len(neighbor_keys)) // len(self.shifts), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        point_index = self.order[np.repeat(first, counts) + offsets]
+
+        delta = self.points[point_index] - points[query_index]
+        delta -= self.box_side * np.rint(delta / self.box_side)
+        distance = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+        close = distance < radius
+        return query_index[close], point_index[close], distance[close]
+
+    def overlaps(self, points, radius):
+        """Boolean array telling which of the given points is closer than radius to a stored point."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        query_index = self.query(points, radius)[0]
+        return np.bincount(query_index, minlength=len(points)) > 0
+
+    def pairs(self, radius):
+        """Pairs (i, j), with i < j, of stored points closer than radius, and their distances."""
+        query_index, point_index, distance = self.query(self.points[:self.size], radius)
+        unique = query_index < point_index
+        return query_index[unique], point_index[unique], distance[unique]
@@ -19,9 +19,8 @@ c includes image flags in data file so chains can be unraveled later
       real*8 random
  900  format(a)
  901  format(2f15.6,a)
- 902  format(i3,f5.1)
- 903  format(i10,i8,i8,3f10.4,3i4)
- 904  format(i9,i3,2i9)
+ 903  format(i12,i10,i4,3f18.6,3i7)
+ 904  format(i12,i3,2i12)
 
 c read chain definitions
 
@@ -244,14 +243,6 @@ c write out LAMMPS file
       write (6,901) yboundlo,yboundhi,' ylo yhi'
       write (6,901) zboundlo,zboundhi,' zlo zhi'
 
-      write (6,*)
-      write (6,900) 'Masses'
-      write (6,*)
-
-      do i = 1,ntypes
-        write (6,902) i,1.0
-      enddo
-
       write (6,*)
       write (6,900) 'Atoms'
       write (6,*)
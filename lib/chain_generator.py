@@ -0,0 +1,199 @@
+import numpy as np
+
+from lib.cell_list import CellList
+
+
+class ChainGenerator:
+    """
+    This is the class ChainGenerator. It is the NumPy replacement of chain.f and chain_alone.f:
+    it grows random walks with restriction (fixed bond length and a minimum distance between
+    monomers i-1 and i+1), starting from a random point in the box. All chains of all replicas
+    are grown at once, one monomer per step, so the cost of the Python loop depends only on
+    the number of monomers per chain.
+
+    Optionally, the growth also avoids excluded volume: a trial monomer closer than
+    excluded_cutoff to any monomer already grown in its replica (except the one it is bonded
+    to) is regrown, looking for neighbors in a periodic cell list. A monomer that still overlaps
+    after max_trials attempts is kept, and generate reports how many overlaps remain.
+
+
+    Parameters
+    ----------
+    nchain
+        Number of chains in each replica.
+    nmonomers
+        Number of monomers per chain.
+    rho_star
+        Reduced monomer density, which sets the side of the cubic box.
+    bondlength
+        Distance between bonded monomers (in reduced units).
+    restrict
+        No distance less than this from monomer i-1 to i+1 (in reduced units).
+    seed
+        Seed, or numpy SeedSequence, of the random number generator.
+    excluded_cutoff
+        Smallest distance between non-bonded monomers. None disables the check.
+    max_trials
+        Number of attempts to place a monomer without overlaps before it is kept anyway.
+    """
+
+    def __init__(self, nchain, nmonomers, rho_star, bondlength=0.97, restrict=1.02, seed=None, excluded_cutoff=None, max_trials=100):
+        self.nchain = nchain
+        self.nmonomers = nmonomers
+        self.rho_star = rho_star
+        self.bondlength = bondlength
+        self.restrict = restrict
+        self.natoms = nchain * nmonomers
+        self.box_side = (self.natoms / rho_star) ** (1./3.)
+        self.rng = np.random.default_rng(seed)
+        self.excluded_cutoff = excluded_cutoff
+        self.max_trials = max_trials
+        self.report = {}
+
+    def __random_bonds(self, n):
+        bonds = self.rng.normal(size=(n, 3))
+        bonds *= self.bondlength / np.linalg.norm(bonds, axis=1)[:, None]
+        return bonds
+
+    def __trial_points(self, walks, imonomer, pending):
+        if imonomer == 0:
+            return -self.box_side / 2. + self.rng.random((len(pending), 3)) * self.box_side
+
+        step = self.__random_bonds(len(pending))
+        if imonomer > 1:
+            # regrow only the trial points that violate the i-1 to i+1 restriction
+            back = walks[imonomer - 1, pending] - walks[imonomer - 2, pending]
+            rejected = np.flatnonzero(np.linalg.norm(back + step, axis=1) <= self.restrict)
+            while len(rejected) > 0:
+                step[rejected] = self.__random_bonds(len(rejected))
+                too_close = np.linalg.norm(back[rejected] + step[rejected], axis=1) <= self.restrict
+                rejected = rejected[too_close]
+        return walks[imonomer - 1, pending] + step
+
+    def __free(self, cells, labels, trial, pending, imonomer):
+        free = np.ones(len(pending), dtype=bool)
+        replica = pending // self.nchain
+        for r in np.unique(replica):
+            where = np.flatnonzero(replica == r)
+            # the bonded monomer i-1 is always closer than the cutoff, and is not an overlap
+            query_index, point_index, _ = cells[r].query(trial[where], self.excluded_cutoff)
+            bonded = labels[r][point_index] == pending[where][query_index] * self.nmonomers + imonomer - 1
+            free[where[np.unique(query_index[~bonded])]] = False
+
+            # trial monomers of the same replica must not overlap each other either
+            batch = CellList(self.box_side, self.excluded_cutoff)
+            batch.insert(trial[where])
+            second = batch.pairs(self.excluded_cutoff)[1]
+            free[where[second]] = False
+        return free
+
+    def __grow(self, nwalks):
+        walks = np.empty((self.nmonomers, nwalks, 3))
+        if self.excluded_cutoff is None:
+            everything = np.arange(nwalks)
+            for imonomer in range(self.nmonomers):
+                walks[imonomer] = self.__trial_points(walks, imonomer, everything)
+            return walks
+
+        nreplicas = nwalks // self.nchain
+        cells = [CellList(self.box_side, self.excluded_cutoff) for r in range(nreplicas)]
+        labels = [np.empty(0, dtype=np.int64) for r in range(nreplicas)]
+        trials = 0
+        forced = 0
+        for imonomer in range(self.nmonomers):
+            pending = np.arange(nwalks)
+            attempt = 0
+            while len(pending) > 0:
+                trial = self.__trial_points(walks, imonomer, pending)
+                attempt += 1
+                trials += len(pending)
+                if attempt < self.max_trials:
+                    free = self.__free(cells, labels, trial, pending, imonomer)
+                else:
+                    free = np.ones(len(pending), dtype=bool)
+                    forced += len(pending)
+                walks[imonomer, pending[free]] = trial[free]
+                accepted = pending[free]
+                replica = accepted // self.nchain
+                for r in np.unique(replica):
+                    cells[r].insert(trial[free][replica == r])
+                    labels[r] = np.concatenate((labels[r], accepted[replica == r] * self.nmonomers + imonomer))
+                pending = pending[~free]
+
+        self.report["trials"] = trials
+        self.report["forced"] = forced
+        return walks
+
+    def count_overlaps(self, positions, cutoff):
+        """
+        Number of pairs of non-bonded monomers closer than cutoff, in one replica.
+
+        Parameters
+        ----------
+        positions
+            Array of shape (natoms, 3) with the positions of one replica, chain by chain.
+        cutoff
+            Distance below which two monomers overlap.
+        """
+        cells = CellList(self.box_side, cutoff)
+        cells.insert(positions)
+        first, second, _ = cells.pairs(cutoff)
+        bonded = (second - first == 1) & (first // self.nmonomers == second // self.nmonomers)
+        return int(np.count_nonzero(~bonded))
+
+    def wrap(self, unwrapped):
+        """
+        Maps unwrapped positions back into the periodic box, returning the wrapped positions
+        and the image flags that recover the unwrapped ones.
+        """
+        images = np.floor((unwrapped + self.box_side / 2.) / self.box_side).astype(np.int64)
+        return unwrapped - images * self.box_side, images
+
+    def generate(self, num_replicas=1):
+        """
+        Grows the chains of num_replicas independent replicas.
+
+        Returns
+        -------
+        positions
+            Array of shape (num_replicas, natoms, 3) with wrapped positions, chain by chain.
+        molecule
+            Array of shape (natoms,) with the molecule ID of each monomer.
+        images
+            Array of shape (num_replicas, natoms, 3) with the image flags of each monomer.
+
+        With excluded volume, self.report gets the number of trial monomers, the number of
+        monomers kept after max_trials, and the overlaps left in each replica.
+        """
+        walks = self.__grow(num_replicas * self.nchain)
+        positions = walks.reshape(self.nmonomers, num_replicas, self.nchain, 3)
+        positions = positions.transpose(1, 2, 0, 3).reshape(num_replicas, self.natoms, 3)
+        del walks
+        # wrapped in place, with one temporary array, so that large systems fit in memory
+        images = positions + self.box_side / 2.
+        images /= self.box_side
+        images = np.floor(images, out=images).astype(np.int64)
+        positions -= images * self.box_side
+        if self.excluded_cutoff is not None:
+            self.report["overlaps"] = [self.count_overlaps(replica, self.excluded_cutoff) for replica in positions]
+        return positions, self.molecule_ids(), images
+
+    def molecule_ids(self):
+        """Molecule ID of each monomer, one molecule per chain."""
+        return np.repeat(np.arange(1, self.nchain + 1), self.nmonomers)
+
+    def bonds(self, first_chain=0, last_chain=None):
+        """
+        Array of shape (nbonds, 2) with the 1-based atom IDs bonded along each chain, from
+        first_chain to last_chain (excluded), by default of all the chains.
+        """
+        last_chain = self.nchain if last_chain is None else last_chain
+        atoms = np.arange(first_chain * self.nmonomers + 1, last_chain * self.nmonomers + 1)
+        first = atoms.reshape(-1, self.nmonomers)[:, :-1].ravel()
+        return np.column_stack((first, first + 1))
+
+    def bond_batches(self, batch_size=65536):
+        """Yields the bonds of whole chains, about batch_size at a time, so that they are never all in memory."""
+        chains_per_batch = max(1, batch_size // max(self.nmonomers - 1, 1))
+        for first_chain in range(0, self.nchain, chains_per_batch):
+            yield self.bonds(first_chain, min(first_chain + chains_per_batch, self.nchain))
@@ -0,0 +1,278 @@
+import gzip
+
+import numpy as np
+
+_POWERS = 10 ** np.arange(19, dtype=np.int64)
+
+
+def _ascii_column(values, decimals=0):
+    """
+    Formats a column of numbers as a (width, n) block of ASCII characters, right aligned,
+    with a fixed number of decimals. The width is taken from the values themselves, so large
+    IDs or coordinates never overflow the field.
+    """
+    if decimals:
+        scaled = np.rint(np.asarray(values, dtype=np.float64) * 10**decimals).astype(np.int64)
+    else:
+        scaled = np.asarray(values, dtype=np.int64)
+    negative = scaled < 0
+    magnitude = np.abs(scaled)
+    if len(magnitude) and magnitude.max() < 2**32:
+        magnitude = magnitude.astype(np.uint32)
+    ndigits = np.maximum(np.searchsorted(_POWERS, magnitude, side="right"), decimals + 1)
+    maxdigits = int(ndigits.max()) if len(ndigits) else 1
+    point = 1 if decimals else 0
+    width = maxdigits + point + int(negative.any())
+
+    field = np.full((width, len(scaled)), ord(" "), dtype=np.uint8)
+    row = width - 1
+    for k in range(maxdigits):
+        if point and k == decimals:
+            field[row] = ord(".")
+            row -= 1
+        quotient = magnitude // 10
+        digit = (magnitude - quotient * 10).astype(np.uint8)
+        digit += ord("0")
+        if k > decimals:
+            digit[ndigits <= k] = ord(" ")
+        field[row] = digit
+        magnitude = quotient
+        row -= 1
+
+    where = np.flatnonzero(negative)
+    field[width - 1 - point - ndigits[where], where] = ord("-")
+    return field
+
+
+def _ascii_rows(columns):
+    """Joins formatted columns, given as (values, decimals) pairs, into newline terminated rows."""
+    n = len(columns[0][0])
+    separator = np.full((1, n), ord(" "), dtype=np.uint8)
+    parts = []
+    for values, decimals in columns:
+        parts.append(_ascii_column(values, decimals))
+        parts.append(separator)
+    parts[-1] = np.full((1, n), ord("\n"), dtype=np.uint8)
+    return np.vstack(parts).T.tobytes()
+
+
+class DataFileWriter:
+    """
+    This is the class DataFileWriter. It streams a LAMMPS data file for atom_style molecular
+    to disk in a single pass: the header, with the counts given up front, then the Masses,
+    Atoms and Bonds sections, whose rows can be given in any number of blocks (e.g. the
+    chains of a replica, then its obstacles, or the bonds of a batch of chains). Each block is
+    formatted by NumPy chunk_size rows at a time and written at once, so the memory used does
+    not depend on the size of the system, and the width of every field is taken from the
+    values, so large IDs and coordinates never overflow. A path ending in .gz is compressed as
+    it is written; read_data reads gzipped files.
+
+    The layout is the one produced by chain.f, without the Masses section unless masses are
+    given, since masses are set in the LAMMPS script.
+
+
+    Parameters
+    ----------
+    path
+        Name of the data file to be written.
+    box_side
+        Side of the cubic box, centered at the origin.
+    natoms
+        Number of atoms that will be written.
+    nbonds
+        Number of bonds that will be written.
+    n_atom_types
+        Number of atom types declared in the header.
+    n_bond_types
+        Number of bond types declared in the header.
+    masses
+        A dictionary from atom type to its mass, written as a Masses section. None omits it.
+    chunk_size
+        Number of rows formatted at once.
+    compresslevel
+        gzip compression level of .gz files; 1 is the fastest.
+    """
+
+    def __init__(self, path, box_side, natoms, nbonds, n_atom_types, n_bond_types=1, masses=None, chunk_size=65536, compresslevel=1):
+        self.path = str(path)
+        self.natoms = natoms
+        self.nbonds = nbonds
+        self.chunk_size = chunk_size
+        self.atoms_written = 0
+        self.bonds_written = 0
+        if self.path.endswith(".gz"):
+            self.fdata = gzip.open(self.path, "wb", compresslevel=compresslevel)
+        else:
+            self.fdata = open(self.path, "wb")
+
+        half = box_side / 2.
+        header = "LAMMPS FENE chain data file\n\n"
+        header += "{} atoms\n".format(natoms)
+        header += "{} bonds\n".format(nbonds)
+        header += "0 angles\n0 dihedrals\n0 impropers\n\n"
+        header += "{} atom types\n".format(n_atom_types)
+        header += "{} bond types\n".format(n_bond_types)
+        header += "0 angle types\n0 dihedral types\n0 improper types\n\n"
+        header += "{:.6f} {:.6f} xlo xhi\n".format(-half, half)
+        header += "{:.6f} {:.6f} ylo yhi\n".format(-half, half)
+        header += "{:.6f} {:.6f} zlo zhi\n\n".format(-half, half)
+        if masses is not None:
+            header += "Masses\n\n"
+            header += "".join("{} {}\n".format(atom_type, masses[atom_type]) for atom_type in sorted(masses))
+            header += "\n"
+        self.fdata.write(header.encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.fdata.close()
+
+    def atoms(self, positions, molecule, types, images, ids=None):
+        """
+        Writes a block of atoms. Without ids, the atoms are numbered in the order they are
+        written, continuing from the previous block.
+        """
+        if self.atoms_written + len(positions) > self.natoms:
+            raise ValueError("more atoms written to {} than the {} declared".format(self.path, self.natoms))
+        if self.atoms_written == 0:
+            self.fdata.write(b"Atoms\n\n")
+        for start in range(0, len(positions), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            count = len(positions[chunk])
+            first = self.atoms_written + 1
+            self.fdata.write(_ascii_rows([(np.arange(first, first + count) if ids is None else ids[chunk], 0),
+                                          (molecule[chunk], 0), (types[chunk], 0),
+                                          (positions[chunk, 0], 6), (positions[chunk, 1], 6), (positions[chunk, 2], 6),
+                                          (images[chunk, 0], 0), (images[chunk, 1], 0), (images[chunk, 2], 0)]))
+            self.atoms_written += count
+
+    def bonds(self, bonds, bond_type=1):
+        """Writes a block of bonds, an array of shape (nbonds, 2) of 1-based atom IDs, all of type bond_type."""
+        if self.atoms_written != self.natoms:
+            raise ValueError("{} of the {} atoms of {} written before the bonds".format(self.atoms_written, self.natoms, self.path))
+        if self.bonds_written + len(bonds) > self.nbonds:
+            raise ValueError("more bonds written to {} than the {} declared".format(self.path, self.nbonds))
+        if self.bonds_written == 0 and len(bonds):
+            self.fdata.write(b"\nBonds\n\n")
+        for start in range(0, len(bonds), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            count = len(bonds[chunk])
+            first = self.bonds_written + 1
+            self.fdata.write(_ascii_rows([(np.arange(first, first + count), 0), (np.full(count, bond_type, dtype=np.int64), 0),
+                                          (bonds[chunk, 0], 0), (bonds[chunk, 1], 0)]))
+            self.bonds_written += count
+
+    def close(self):
+        """Closes the file, checking that every declared atom and bond was written."""
+        self.fdata.close()
+        if self.atoms_written != self.natoms or self.bonds_written != self.nbonds:
+            raise ValueError("{} was declared with {} atoms and {} bonds, but {} and {} were written".format(
+                self.path, self.natoms, self.nbonds, self.atoms_written, self.bonds_written))
+
+
+def write_lammps_data(path, box_side, positions, molecule, types, images, bonds, n_atom_types, n_bond_types=1, chunk_size=65536, ids=None, masses=None):
+    """
+    Writes a LAMMPS data file for atom_style molecular at once, with DataFileWriter. A path
+    ending in .gz is gzipped.
+
+
+    Parameters
+    ----------
+    path
+        Name of the data file to be written.
+    box_side
+        Side of the cubic box, centered at the origin.
+    positions
+        Array of shape (natoms, 3) with the wrapped atom positions.
+    molecule
+        Array of shape (natoms,) with the molecule ID of each atom.
+    types
+        Array of shape (natoms,) with the atom type of each atom.
+    images
+        Array of shape (natoms, 3) with the image flags of each atom.
+    bonds
+        Array of shape (nbonds, 2) with the 1-based atom IDs of each bond.
+    n_atom_types
+        Number of atom types declared in the header.
+    n_bond_types
+        Number of bond types declared in the header. All bonds are written with type 1.
+    chunk_size
+        Number of rows formatted at once.
+    ids
+        Array of shape (natoms,) with the atom ID of each row, when the atoms are not written
+        in the order of their IDs (see ordering.reorder_atoms). By default 1 to natoms.
+    masses
+        A dictionary from atom type to its mass, written as a Masses section. None omits it.
+    """
+    with DataFileWriter(path, box_side, len(positions), len(bonds), n_atom_types, n_bond_types, masses, chunk_size) as writer:
+        writer.atoms(positions, molecule, types, images, ids)
+        writer.bonds(bonds)
+
+
+def read_lammps_data(path):
+    """
+    Reads a LAMMPS data file for atom_style molecular, as written by write_lammps_data,
+    chain.f or the LAMMPS write_data command, gzipped when path ends in .gz. Sections other
+    than Atoms and Bonds (Masses, Velocities, coefficients) are skipped, and the atoms are
+    sorted by ID.
+
+    Returns
+    -------
+    data
+        A dictionary with the box bounds "lo" and "hi" (arrays of shape (3,)), the number of
+        atom and bond types, and the arrays "positions" (natoms, 3), "molecule", "types",
+        "images" (natoms, 3, zero when the file has none), "bonds" (nbonds, 2, 1-based atom
+        IDs) and "bond_types".
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rb") as fdata:
+        lines = fdata.read().split(b"\n")
+
+    counts = {}
+    lo, hi = np.zeros(3), np.zeros(3)
+    sections = {}
+    number = 1
+    while number < len(lines):
+        line = lines[number].split(b"#")[0].strip()
+        words = line.split()
+        if len(words) >= 2 and words[-1] in (b"atoms", b"bonds") or words[-2:] in ([b"atom", b"types"], [b"bond", b"types"]):
+            counts[b" ".join(words[1:]).decode()] = int(words[0])
+        elif len(words) == 4 and words[2:] in ([b"xlo", b"xhi"], [b"ylo", b"yhi"], [b"zlo", b"zhi"]):
+            axis = "xyz".index(words[2][:1].decode())
+            lo[axis], hi[axis] = float(words[0]), float(words[1])
+        elif words and words[0] in (b"Atoms", b"Bonds"):
+            # the section starts after a blank line
+            key = "atoms" if words[0] == b"Atoms" else "bonds"
+            start = number + 2
+            sections[words[0].decode()] = (start, start + counts.get(key, 0))
+            number = start + counts.get(key, 0) - 1
+        number += 1
+
+    start, end = sections["Atoms"]
+    natoms = end - start
+    atoms = np.fromstring(b" ".join(lines[start:end]), sep=" ")
+    atoms = atoms.reshape(natoms, -1) if natoms else np.empty((0, 9))
+    atoms = atoms[np.argsort(atoms[:, 0], kind="stable")]
+    images = atoms[:, 6:9].astype(np.int64) if atoms.shape[1] >= 9 else np.zeros((natoms, 3), dtype=np.int64)
+
+    bonds = np.empty((0, 4))
+    if "Bonds" in sections:
+        start, end = sections["Bonds"]
+        bonds = np.fromstring(b" ".join(lines[start:end]), sep=" ").reshape(end - start, 4)
+
+    return {
+        "lo": lo,
+        "hi": hi,
+        "n_atom_types": counts.get("atom types", int(atoms[:, 2].max()) if natoms else 1),
+        "n_bond_types": counts.get("bond types", 1),
+        "positions": atoms[:, 3:6],
+        "molecule": atoms[:, 1].astype(np.int64),
+        "types": atoms[:, 2].astype(np.int64),
+        "images": images,
+        "bonds": bonds[:, 2:4].astype(np.int64),
+        "bond_types": bonds[:, 1].astype(np.int64),
+    }
@@ -0,0 +1,129 @@
+import copy
+
+import numpy as np
+
+
+class Diagnostics:
+    """
+    This is the class Diagnostics. It holds the sampling schedule of every output of the
+    production run: the thermodynamic averages, the obstacle and chain MSDs, the chain centers
+    of mass and the snapshots. The defaults reproduce the former fixed schedules; any observable
+    can be sampled less often, or switched off with None. The MSDs can be sampled at log-spaced
+    steps (logfreq), which covers every time scale of a long run with a few rows per decade, and
+    the snapshots can be written as binary or gzipped dumps.
+
+    estimate_bytes tells how large the output of a run will be before it is generated.
+
+
+    Parameters
+    ----------
+    overrides
+        Optional dictionary replacing some of the defaults, for example
+        {"com": {"every": 1000, "repeat": 1, "freq": 1000}, "dump": {"format": "binary"},
+        "msd_sampling": "log"}. Keys given as dictionaries are merged into the defaults.
+    """
+
+    defaults = {
+        "thermo": {"every": 20, "repeat": 50, "freq": 1000},
+        "obstacle_msd": {"every": 2, "repeat": 6, "freq": 100},
+        "com": {"every": 100, "repeat": 1, "freq": 100},
+        "polymer_msd": {"every": 1000, "repeat": 1, "freq": 1000},
+        "dump": {"every": 10000, "format": "text"},
+        "msd_sampling": "linear",
+        "log_start": 100,
+    }
+    dump_extensions = {"text": "", "binary": ".bin", "gz": ".gz"}
+
+    # typical bytes of one value as written by LAMMPS: %.15g, %g and dump custom defaults
+    wide_value = 22
+    value = 13
+    step = 10
+
+    def __init__(self, overrides=None):
+        self.settings = copy.deepcopy(self.defaults)
+        for key, value in (overrides or {}).items():
+            if key not in self.defaults:
+                raise ValueError("unknown diagnostics key {!r}".format(key))
+            if isinstance(value, dict) and isinstance(self.settings[key], dict):
+                self.settings[key].update(value)
+            else:
+                self.settings[key] = value
+
+        for key in ["thermo", "obstacle_msd", "com", "polymer_msd"]:
+            average = self.settings[key]
+            # the rules of fix ave/time
+            if average is not None and (average["freq"] % average["every"] != 0 or average["every"] * average["repeat"] > average["freq"]):
+                raise ValueError("diagnostics {}: freq must be a multiple of every, and at least every*repeat".format(key))
+        if self.settings["msd_sampling"] not in ["linear", "log"]:
+            raise ValueError("diagnostics msd_sampling must be 'linear' or 'log'")
+        if self.settings["dump"] is not None and self.settings["dump"]["format"] not in self.dump_extensions:
+            raise ValueError("diagnostics dump format must be one of {}".format(sorted(self.dump_extensions)))
+
+    def dump_name(self, name):
+        """Name of the snapshot file, with the extension that selects the dump format."""
+        return name + self.dump_extensions[self.settings["dump"]["format"]]
+
+    def log_samples(self, number_of_steps):
+        """Steps written by the log-spaced sampling, logfreq(log_start, 9, 10), up to number_of_steps."""
+        steps = []
+        decade = self.settings["log_start"]
+        while decade <= number_of_steps:
+            steps += [k * decade for k in range(1, 10) if k * decade <= number_of_steps]
+            decade *= 10
+        return steps
+
+    def estimate_bytes(self, number_of_steps, nchain, natoms, obstacles=True):
+        """
+        Estimated size in bytes of every output file of one production run.
+
+        Parameters
+        ----------
+        number_of_steps
+            Length of the production run.
+        nchain
+            Number of chains.
+        natoms
+            Number of atoms, beads and obstacles, in the snapshots.
+        obstacles
+            Whether the obstacle MSD is written.
+
+        Returns
+        -------
+        estimate
+            A dictionary from output name to its estimated size, with the sum under "total".
+        """
+        def rows(average):
+            return number_of_steps // average["freq"] + 1
+
+        estimate = {}
+        thermo = self.settings["thermo"]
+        if thermo is not None:
+            estimate["thermo"] = rows(thermo) * (self.step + 4 * self.wide_value)
+        log = self.settings["msd_sampling"] == "log"
+        msd = self.settings["obstacle_msd"]
+        if obstacles and msd is not None:
+            estimate["obstacle_msd"] = (len(self.log_samples(number_of_steps)) if log else rows(msd)) * (self.step + self.value)
+        msd = self.settings["polymer_msd"]
+        if msd is not None:
+            if log:
+                estimate["polymer_msd"] = len(self.log_samples(number_of_steps)) * (self.step + self.value)
+            else:
+                estimate["polymer_msd"] = rows(msd) * (2 * self.step + nchain * (self.step + self.value))
+        com = self.settings["com"]
+        if com is not None:
+            estimate["com"] = rows(com) * (2 * self.step + nchain * (self.step + 3 * self.value))
+        dump = self.settings["dump"]
+        if dump is not None:
+            snapshots = number_of_steps // dump["every"] + 1
+            if dump["format"] == "binary":
+                # 8 doubles per atom and a header of a few hundred bytes
+                per_snapshot = 200 + natoms * 8 * 8
+            else:
+                per_snapshot = 200 + natoms * (2 * self.step + 6 * self.value)
+                if dump["format"] == "gz":
+                    per_snapshot = per_snapshot // 3
+            estimate["dump"] = snapshots * per_snapshot
+        for name in estimate:
+            estimate[name] = int(estimate[name])
+        estimate["total"] = int(np.sum(list(estimate.values())))
+        return estimate
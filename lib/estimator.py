@@ -0,0 +1,249 @@
+import json
+import re
+
+import numpy as np
+
+
+# seconds of one core per atom-step and per neighbor pair-step, and per bond-step, for
+# lj/cut and fene with a Langevin thermostat; typical of a current x86 core
+DEFAULT_THROUGHPUT = {"atom": 3.0e-7, "pair": 2.0e-8, "bond": 5.0e-8}
+
+# memory of a LAMMPS process: the executable and its buffers, each owned or ghost atom of
+# atom_style molecular with its bonds and special list, and each neighbor pair
+BASE_MEMORY = 50 * 2**20
+ATOM_MEMORY = 400
+PAIR_MEMORY = 8
+
+# iterations of "minimize 0.00000001 0.000000001 10000 100000" counted as force evaluations
+MINIMIZE_ITERATIONS = 10000
+
+
+class ThroughputModel:
+    """
+    This is the class ThroughputModel. It gives the core-seconds of one MD step from the
+    number of atoms, neighbor pairs and bonds, as cost = atoms*t_atom + pairs*t_pair +
+    bonds*t_bond. The default coefficients are generic; calibrate fits t_atom and t_pair
+    to the loop times of LAMMPS logs run on the local machine.
+
+
+    Parameters
+    ----------
+    coefficients
+        A dictionary with the seconds per "atom", "pair" and "bond" step, or the name of a
+        JSON file written by save. By default DEFAULT_THROUGHPUT.
+    """
+
+    def __init__(self, coefficients=None):
+        if isinstance(coefficients, str):
+            with open(coefficients) as fmodel:
+                coefficients = json.load(fmodel)
+        self.coefficients = dict(DEFAULT_THROUGHPUT)
+        self.coefficients.update(coefficients or {})
+
+    def core_seconds(self, atoms, pairs, bonds, steps):
+        """Core-seconds of steps MD steps."""
+        per_step = (atoms * self.coefficients["atom"] + pairs * self.coefficients["pair"]
+                    + bonds * self.coefficients["bond"])
+        return per_step * steps
+
+    @staticmethod
+    def read_log(path):
+        """
+        Reads the runs of a LAMMPS log: a list of dictionaries with the loop time, the number
+        of processes, steps and atoms, and the average neighbors per atom of each run.
+        """
+        runs = []
+        with open(path) as flog:
+            text = flog.read()
+        loops = re.finditer(r"Loop time of ([\d.eE+-]+) on (\d+) procs for (\d+) steps with (\d+) atoms", text)
+        for loop in loops:
+            neighbors = re.search(r"Ave neighs/atom = ([\d.eE+-]+)", text[loop.end():])
+            runs.append({"seconds": float(loop.group(1)), "procs": int(loop.group(2)), "steps": int(loop.group(3)),
+                         "atoms": int(loop.group(4)), "neighbors": float(neighbors.group(1)) if neighbors else 0.})
+        return runs
+
+    def calibrate(self, logs, bonds_per_atom=1.0):
+        """
+        Fits t_atom and t_pair to the runs of the given LAMMPS logs by least squares, keeping
+        t_bond, and returns the fitted coefficients. Logs of systems with different neighbor
+        counts (e.g. different phi_hs) are needed to separate the two.
+
+        Parameters
+        ----------
+        logs
+            A list of LAMMPS log files.
+        bonds_per_atom
+            Bonds per atom of the logged systems, whose cost is subtracted.
+        """
+        runs = [run for path in logs for run in self.read_log(path) if run["steps"] > 0]
+        if not runs:
+            raise ValueError("no runs found in the logs")
+        # core-seconds per atom-step = t_atom + t_pair * neighbors per atom
+        cost = np.array([run["seconds"] * run["procs"] / run["steps"] / run["atoms"] for run in runs])
+        cost -= bonds_per_atom * self.coefficients["bond"]
+        neighbors = np.array([run["neighbors"] for run in runs])
+        if np.ptp(neighbors) > 0:
+            design = np.column_stack((np.ones(len(runs)), neighbors))
+            (t_atom, t_pair), _, _, _ = np.linalg.lstsq(design, cost, rcond=None)
+            self.coefficients["atom"] = max(float(t_atom), 0.)
+            self.coefficients["pair"] = max(float(t_pair), 0.)
+        else:
+            # a single neighbor count only gives the total: scale both coefficients
+            model = self.coefficients["atom"] + self.coefficients["pair"] * neighbors[0]
+            scale = float(np.mean(cost)) / model
+            self.coefficients["atom"] *= scale
+            self.coefficients["pair"] *= scale
+        return self.coefficients
+
+    def save(self, path):
+        """Writes the coefficients to a JSON file, to be given back to ThroughputModel."""
+        with open(path, "w") as fmodel:
+            json.dump(self.coefficients, fmodel, indent=2)
+
+
+def _pairs_per_atom(counts, cutoffs, volume, skin, nmonomers, bondlength=0.97):
+    # half neighbor list: every pair once. Beads also see the monomers of their own chain,
+    # much denser than the mean density; a self-avoiding walk has (r/b)**(1/0.588)
+    # monomers within r on each side, of which the bonded one is excluded
+    types = sorted(counts)
+    natoms = sum(counts.values())
+    total = 0.
+    for i in types:
+        for j in types:
+            cutoff = cutoffs[(min(i, j), max(i, j))] + skin
+            total += 0.5 * counts[i] * counts[j] / volume * 4. / 3. * np.pi * cutoff ** 3.
+    reach = cutoffs[(types[0], types[0])] + skin
+    intra = min(2. * max((reach / bondlength) ** (1. / 0.588) - 1., 0.), nmonomers - 1.)
+    total += 0.5 * counts[types[0]] * intra
+    return total / natoms
+
+
+def estimate(simulation, ranks=1, model=None):
+    """
+    Estimates the cost of a PolymerSimulation from its parameters alone: the neighbor pairs
+    per atom, the memory per rank, the steps of every stage, the output volume, and the
+    core-hours of all the replicas.
+
+    Parameters
+    ----------
+    simulation
+        A PolymerSimulation, typically built with "dry_run", which only derives its parameters.
+    ranks
+        MPI ranks of each replica.
+    model
+        A ThroughputModel, by default with DEFAULT_THROUGHPUT.
+
+    Returns
+    -------
+    estimate
+        A dictionary describing the cost of the simulation.
+    """
+    model = model or ThroughputModel()
+    nbeads = simulation.nchain * simulation.nmonomers
+    nbonds = simulation.nchain * (simulation.nmonomers - 1)
+    if simulation.type_simulation:
+        counts = {1: nbeads, 2: simulation.n_hs}
+        cutoffs = {(1, 1): simulation.cut11, (1, 2): simulation.cut12, (2, 2): simulation.cut22}
+    else:
+        counts = {1: nbeads}
+        cutoffs = {(1, 1): max(simulation.cut11, 2.5)}
+    natoms = sum(counts.values())
+    profile = simulation.performance_profile
+    skin = profile.settings["skin"] if profile is not None else 4.0
+
+    # the push-off runs a soft potential with a cutoff of 1 between the beads, and of the contact
+    # distance with the obstacles, which are already in the box unless the state cache prepares the chains
+    soft = {pair: 1.0 for pair in cutoffs}
+    if simulation.type_simulation and getattr(simulation, "state_cache", None) is None:
+        soft[(1, 2)], soft[(2, 2)] = simulation.sigmaAB, simulation.sigmaBB
+    # a tiled box skips the push-off
+    tile = getattr(simulation, "tile", None)
+    stages = {
+        "pushoff": {"steps": simulation.pushoff_steps if tile is None else 0, "pairs_per_atom": _pairs_per_atom(counts, soft, simulation.volume, skin, simulation.nmonomers)},
+        "minimize": {"steps": MINIMIZE_ITERATIONS},
+        "equilibration": {"steps": simulation.number_of_steps_equilibration},
+        "production": {"steps": simulation.number_of_steps},
+    }
+    if tile is not None:
+        stages["minimize"]["steps"] = MINIMIZE_ITERATIONS if simulation.type_simulation else 0
+        stages["decorrelation"] = {"steps": tile["decorrelation_steps"]}
+    pairs = _pairs_per_atom(counts, cutoffs, simulation.volume, skin, simulation.nmonomers)
+    for name in stages:
+        stages[name].setdefault("pairs_per_atom", pairs)
+    for name, stage in stages.items():
+        stage["core_hours"] = model.core_seconds(natoms, natoms * stage["pairs_per_atom"], nbonds, stage["steps"]) / 3600.
+    if simulation.state_cache is not None:
+        # the push-off is run once per cached state, and not at all when it is already equilibrated
+        stages["pushoff"]["shared"] = True
+
+    # owned atoms of a rank plus its ghosts, a shell as thick as the largest ghost cutoff
+    ghost_cutoff = max(cutoffs.values()) + skin
+    side = (simulation.volume / ranks) ** (1. / 3.)
+    ghost_fraction = ((side + 2. * ghost_cutoff) ** 3. - side ** 3.) / side ** 3. if ranks > 1 else 0.
+    atoms_per_rank = natoms / ranks * (1. + ghost_fraction)
+    memory = BASE_MEMORY + atoms_per_rank * (ATOM_MEMORY + PAIR_MEMORY * pairs)
+
+    core_hours = sum(stage["core_hours"] for stage in stages.values()) * simulation.num_files
+    return {
+        "filename": str(simulation.filename),
+        "natoms": natoms,
+        "n_hs": counts.get(2, 0),
+        "box_side": simulation.box_side,
+        "pairs_per_atom": pairs,
+        "ranks": ranks,
+        "memory_per_rank": int(memory),
+        "stages": stages,
+        "total_steps": sum(stage["steps"] for stage in stages.values()),
+        "output_bytes": simulation.output_bytes["total"] * simulation.num_files,
+        "replicas": simulation.num_files,
+        "core_hours": core_hours,
+        "wall_hours": core_hours / simulation.num_files / ranks,
+        "throughput": dict(model.coefficients),
+    }
+
+
+def pack(estimates, cores_per_node, memory_per_node, nodes=None):
+    """
+    Packs the replicas of several estimated simulations (e.g. the points of a sweep) onto
+    nodes, longest first, each replica on the node that becomes free first, so that the nodes
+    finish at about the same time (longest processing time scheduling). A node runs as many
+    replicas at once as fit in its cores and its memory.
+
+    Parameters
+    ----------
+    estimates
+        A list of results of estimate.
+    cores_per_node
+        Cores of a node.
+    memory_per_node
+        Memory of a node, in bytes.
+    nodes
+        Number of nodes, by default as many as needed to run every replica at once.
+
+    Returns
+    -------
+    packing
+        A list with one dictionary per node slot (a set of cores that runs replicas one after
+        another): its node, the replicas it runs as (estimate index, replica) pairs, and its
+        wall hours. The longest slot gives the wall time of the whole set.
+    """
+    jobs = []
+    for index, cost in enumerate(estimates):
+        if cost["ranks"] > cores_per_node or cost["memory_per_rank"] * cost["ranks"] > memory_per_node:
+            raise ValueError("a replica of {} does not fit on a node".format(cost["filename"]))
+        for replica in range(cost["replicas"]):
+            jobs.append((cost["wall_hours"], index, replica))
+    jobs.sort(reverse=True)
+
+    # slots are sized for the widest and most memory hungry replica
+    ranks = max(cost["ranks"] for cost in estimates)
+    memory = max(cost["memory_per_rank"] * cost["ranks"] for cost in estimates)
+    per_node = max(1, min(cores_per_node // ranks, int(memory_per_node // memory)))
+    if nodes is None:
+        nodes = int(np.ceil(len(jobs) / per_node))
+    slots = [{"node": k // per_node, "replicas": [], "wall_hours": 0.} for k in range(nodes * per_node)]
+    for hours, index, replica in jobs:
+        slot = min(slots, key=lambda slot: slot["wall_hours"])
+        slot["replicas"].append((index, replica))
+        slot["wall_hours"] += hours
+    return slots
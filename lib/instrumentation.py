@@ -0,0 +1,86 @@
+import contextlib
+import os
+import resource
+import time
+import tracemalloc
+
+
+class Instrumentation:
+    """
+    This is the class Instrumentation. It records, for every stage of the input generation
+    (compiling chain.f, writing def.chain2, running ./chain, growing the chains in Python,
+    placing the obstacles, writing the data files and the scripts, ...) and every replica,
+    the wall time, the bytes written and the peak memory. The peak memory of Python stages is
+    the largest allocation traced by tracemalloc during the stage; stages that run a
+    subprocess also report the largest resident size of any child process so far.
+
+    When disabled, stage() does nothing, so the hooks cost nothing in normal runs.
+
+
+    Parameters
+    ----------
+    enabled
+        Whether the stages are recorded.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, name, replica=None, files=(), subprocess=False):
+        """
+        Context manager that records one stage.
+
+        Parameters
+        ----------
+        name
+            Name of the stage.
+        replica
+            Index of the replica, or None for stages shared by all replicas.
+        files
+            Files written by the stage; their sizes are the bytes written.
+        subprocess
+            Whether the stage runs a subprocess, whose peak memory is then reported.
+        """
+        if not self.enabled:
+            yield
+            return
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            record = {
+                "stage": name,
+                "replica": replica,
+                "seconds": seconds,
+                "bytes": sum(os.path.getsize(path) for path in files if os.path.exists(path)),
+                "peak_memory": peak,
+            }
+            if subprocess:
+                # ru_maxrss is in kilobytes on Linux
+                record["child_peak_memory"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+            self.records.append(record)
+
+    def summary(self):
+        """Totals per stage: number of calls, seconds, bytes and the largest peak memory."""
+        summary = {}
+        for record in self.records:
+            total = summary.setdefault(record["stage"], {"calls": 0, "seconds": 0., "bytes": 0, "peak_memory": 0})
+            total["calls"] += 1
+            total["seconds"] += record["seconds"]
+            total["bytes"] += record["bytes"]
+            total["peak_memory"] = max(total["peak_memory"], record["peak_memory"])
+        return summary
+
+    def report(self):
+        """The records of every stage and their summary, ready to be dumped as JSON."""
+        return {"records": self.records, "summary": self.summary()}
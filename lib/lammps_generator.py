@@ -1,6 +1,19 @@
 import numpy as np 
+import io
 import os 
 
+from lib.chain_generator import ChainGenerator
+from lib.data_file import DataFileWriter, read_lammps_data
+from lib.diagnostics import Diagnostics
+from lib.estimator import ThroughputModel, estimate
+from lib.instrumentation import Instrumentation
+from lib.obstacle_placement import ObstaclePlacement
+from lib.ordering import reorder_atoms
+from lib.partitions import write_partition_script
+from lib.performance import PerformanceProfile
+from lib.state_cache import EquilibratedStateCache
+from lib.tiling import tile_data
+
 
 class PolymerSimulation:
     """
@@ -8,7 +21,12 @@ class PolymerSimulation:
     it will execute the chain.f, or chain_alone.f, code for the polymers input generation, 
     and then it will write the LAMMPS inputs for running. chain.f is for the case of mixing 
     polymers with obstacles, and the chain_alone.f is for when one wants only to simulate 
-    polymers in empty space. 
+    polymers in empty space. By default the chains are grown in-process by ChainGenerator, 
+    which follows the same random walk with restriction as the fortran codes; setting 
+    "chain_engine" to "fortran" in system_parameters uses gfortran and chain.f instead. 
+    With the numpy engine the obstacles are also placed in Python, without overlaps, and 
+    written in the data file (see ObstaclePlacement). The neighbor list, communication and 
+    load balancing settings are chosen for each system by PerformanceProfile. 
 
 
     Parameters
@@ -23,10 +41,18 @@ class PolymerSimulation:
         self.system_parameters = system_parameters
         self.pathto = pathto
         self.__initialize_system_parameters()
+        if self.dry_run is not None:
+            self.cost_estimate = estimate(self, self.dry_run.get("ranks", 1), ThroughputModel(self.dry_run.get("calibration")))
+            return
         self.__initialize_polymer_input()
         self.__initialize_lammps_script()
 
     def __initialize_system_parameters(self):
+        self.instrumentation = Instrumentation(self.system_parameters.get("instrumentation", False))
+        dry_run = self.system_parameters.get("dry_run")
+        self.dry_run = None
+        if dry_run:
+            self.dry_run = dry_run if isinstance(dry_run, dict) else {}
         self.sigma0 = self.system_parameters["sigma0"]
         self.mass0 = self.system_parameters["mass0"]
         self.eps0 = self.system_parameters["eps0"]
@@ -61,18 +87,137 @@ class PolymerSimulation:
         self.number_of_steps_equilibration = self.system_parameters["number_of_steps_equilibration"]
         self.low_attraction = self.system_parameters["low_attraction"] 
         self.npart_tot = self.nchain*self.nmonomers + self.n_hs
+        self.chain_engine = self.system_parameters.get("chain_engine", "numpy")
+        self.rng = np.random.default_rng(self.system_parameters.get("seed"))
+        self.state_cache = self.system_parameters.get("state_cache")
+        self.box_bounds = (-self.box_side/2., self.box_side/2.)
+        self.tile = None
+        if self.system_parameters.get("tile"):
+            self.__initialize_tiling()
+            placement = "python" if self.tile["method"] == "python" else "lammps"
+        else:
+            placement = "python" if self.chain_engine == "numpy" and self.state_cache is None else "lammps"
+        self.obstacle_placement = self.system_parameters.get("obstacle_placement", placement)
+        if self.obstacle_placement == "python" and self.chain_engine != "numpy" and self.tile is None:
+            raise ValueError("obstacle_placement 'python' needs chain_engine 'numpy'")
+        if self.tile is not None and (self.state_cache is not None or (self.tile["method"] == "lammps" and self.obstacle_placement == "python")):
+            raise ValueError("tile cannot be used with state_cache, and tile method 'lammps' needs obstacle_placement 'lammps'")
+        if self.state_cache is not None:
+            if self.chain_engine != "numpy":
+                raise ValueError("state_cache needs chain_engine 'numpy'")
+            if self.dry_run is None:
+                self.cache = EquilibratedStateCache(self.state_cache)
+        self.cached_states = []
+        self.obstacle_reports = []
+        self.excluded_volume_cutoff = self.system_parameters.get("excluded_volume_cutoff")
+        if self.excluded_volume_cutoff is not None and self.chain_engine != "numpy":
+            raise ValueError("excluded_volume_cutoff needs chain_engine 'numpy'")
+        self.pushoff_steps = self.system_parameters.get("pushoff_steps", 100000)
+        self.chain_report = []
+        self.script_mode = self.system_parameters.get("script_mode", "files")
+        self.data_format = self.system_parameters.get("data_format", "text")
+        if self.data_format not in ["text", "gz"]:
+            raise ValueError("data_format must be 'text' or 'gz'")
+        self.data_extension = ".data.gz" if self.data_format == "gz" else ".data"
+        adaptive = self.system_parameters.get("adaptive_equilibration")
+        self.adaptive_equilibration = None
+        if adaptive:
+            self.adaptive_equilibration = {"tolerance": 0.01, "check_every": 1000, "min_steps": 2000, "min_distance": 0.8}
+            if isinstance(adaptive, dict):
+                self.adaptive_equilibration.update(adaptive)
+            if self.adaptive_equilibration["check_every"] % 10 != 0:
+                raise ValueError("adaptive_equilibration check_every must be a multiple of 10")
+        self.diagnostics = Diagnostics(self.system_parameters.get("diagnostics"))
+        natoms = self.nchain*self.nmonomers + (self.n_hs if self.type_simulation else 0)
+        self.output_bytes = self.diagnostics.estimate_bytes(self.number_of_steps, self.nchain, natoms, self.type_simulation)
+        tuning = self.system_parameters.get("performance_tuning", True)
+        self.performance_profile = None
+        if tuning:
+            if self.type_simulation:
+                cutoffs = {(1, 1): self.cut11, (1, 2): self.cut12, (2, 2): self.cut22}
+                counts = {1: self.nchain*self.nmonomers, 2: self.n_hs}
+            else:
+                cutoffs = {(1, 1): max(self.cut11, 2.5)}
+                counts = {1: self.nchain*self.nmonomers}
+            self.performance_profile = PerformanceProfile(cutoffs, counts, {1: self.massA, 2: self.massB}, self.volume,
+                                                          self.nmonomers, self.temperature, self.gamma, self.time_step,
+                                                          overrides=tuning if isinstance(tuning, dict) else None)
+        ordering = self.system_parameters.get("atom_ordering")
+        self.atom_ordering = None
+        if ordering:
+            # LAMMPS sorts its atoms in bins of half the neighbor cutoff, and stops when there are more
+            # bins than an int holds: in dilute boxes the bins hold about one atom. The curve cells are
+            # as wide as the sort bins, so the file order matches LAMMPS' own sort
+            if self.performance_profile is not None:
+                binsize = self.performance_profile.settings["binsize"]
+            else:
+                cutoff = (self.cut11 if self.type_simulation else max(self.cut11, 2.5)) + 4.0
+                binsize = round(max(cutoff/2., (self.volume/natoms)**(1./3.)), 4)
+            self.atom_ordering = {"curve": "hilbert", "renumber": False, "sort_every": 1000, "binsize": binsize}
+            self.atom_ordering.update(ordering if isinstance(ordering, dict) else {"curve": ordering})
+            if self.atom_ordering["curve"] not in ["morton", "hilbert"]:
+                raise ValueError("atom_ordering curve must be 'morton' or 'hilbert'")
+
+
+    def __initialize_tiling(self):
+        self.tile = {"k": 2, "method": "python", "decorrelation_steps": 0}
+        self.tile.update(self.system_parameters["tile"])
+        if "data_file" not in self.tile or self.tile["method"] not in ["python", "lammps"]:
+            raise ValueError("tile needs a data_file, and a method 'python' or 'lammps'")
+        self.tile_source = read_lammps_data(self.tile["data_file"])
+        k = self.tile["k"]
+        types = self.tile_source["types"]
+        beads = types != 2
+        nobstacles = int(np.count_nonzero(~beads))
+        if nobstacles > 0 and not self.type_simulation:
+            raise ValueError("the tiled data file has obstacles, but type_simulation is False")
 
+        # the tiled system keeps the density of the small one, and its number of obstacles
+        source_chains = len(np.unique(self.tile_source["molecule"][beads]))
+        self.nmonomers = int(np.count_nonzero(beads)) // source_chains
+        self.nchain = source_chains * k**3
+        side = self.tile_source["hi"][0] - self.tile_source["lo"][0]
+        self.box_side = k * side
+        self.volume = self.box_side ** 3.
+        self.rho_star = self.nchain*self.nmonomers / self.volume
+        self.tile["source_obstacles"] = nobstacles
+        if nobstacles > 0:
+            self.n_hs = nobstacles * k**3
+        else:
+            self.n_hs = int((6.*self.volume*self.phi_hs)/np.pi/(self.sigmaBB**3.))
+        self.npart_tot = self.nchain*self.nmonomers + self.n_hs
+        if self.tile["method"] == "lammps":
+            # replicate keeps the lower corner of the small box
+            lo = self.tile_source["lo"][0]
+            self.box_bounds = (lo, lo + self.box_side)
+        else:
+            # tile_data centers the tiled box at the origin
+            self.box_bounds = (-self.box_side/2., self.box_side/2.)
 
     def __initialize_polymer_input(self):
-        if self.type_simulation:
-            os.system("gfortran "+str(self.pathto)+"/lib/chain.f -o chain")
+        if self.tile is not None:
+            self.__tile_chains()
+        elif self.state_cache is not None:
+            self.__prepare_cached_states()
+        elif self.chain_engine == "numpy":
+            self.__generate_chains()
+        elif self.type_simulation:
+            self.__fortran_chains("chain.f")
+        else:
+            self.__fortran_chains("chain_alone.f")
 
-            for i in range(self.num_files):
+    def __fortran_chains(self, source):
+        with self.instrumentation.stage("compile", files=["chain"], subprocess=True):
+            os.system("gfortran "+str(self.pathto)+"/lib/"+source+" -o chain")
+
+        for i in range(self.num_files):
+            data_file = str(self.filename)+"_poly_input_"+str(i)+self.data_extension
+            with self.instrumentation.stage("def_chain2", i, files=["def.chain2"]):
                 with open('def.chain2','w') as fdata:
                     # First line is a comment line 
                     fdata.write('Polymer chain definition\n\n')
                     fdata.write('{}     rhostar\n'.format(self.rho_star))
-                    fdata.write('{}     random # seed (8 digits or less)\n'.format(np.random.randint(10000, 100000000)))
+                    fdata.write('{}     random # seed (8 digits or less)\n'.format(self.rng.integers(10000, 100000000)))
                     fdata.write('{}     # of sets of chains (blank line + 6 values for each set)\n'.format(1))
                     fdata.write('{}     molecule tag rule: 0 = by mol, 1 = from 1 end, 2 = from 2 ends\n\n'.format(0))
                     fdata.write('{}     number of chains\n'.format(self.nchain))
@@ -81,187 +226,448 @@ class PolymerSimulation:
                     fdata.write('{}     type of bonds (for output into LAMMPS file)\n'.format(1))
                     fdata.write('{}     distance between monomers (in reduced units)\n'.format(0.97))
                     fdata.write('{}     no distance less than this from site i-1 to i+1 (reduced unit)\n'.format(1.02))
-                
-            
-                os.system("./chain < def.chain2 > "+str(self.filename)+"_poly_input_"+str(i)+".data")
-                with open(str(self.filename)+"_poly_input_"+str(i)+".data", "r") as infile:
-                    lines = infile.readlines()
-
-                with open(str(self.filename)+"_poly_input_"+str(i)+".data", "w") as outfile:
-                    for pos, line in enumerate(lines):
-                        if pos != 18 and pos != 20:
-                            outfile.write(line)
-        else:
-            os.system("gfortran "+str(self.pathto)+"/lib/chain_alone.f -o chain")
 
+            # chain writes the data file in a single pass, without Masses, streamed through gzip if asked
+            with self.instrumentation.stage("chain", i, files=[data_file], subprocess=True):
+                if self.data_format == "gz":
+                    os.system("./chain < def.chain2 | gzip -1 > "+data_file)
+                else:
+                    os.system("./chain < def.chain2 > "+data_file)
+
+            if self.atom_ordering is not None:
+                data = read_lammps_data(data_file)
+                self.__write_data(data_file, data["hi"][0] - data["lo"][0],
+                                  [(data["positions"], data["molecule"], data["types"], data["images"])],
+                                  data["bonds"], data["n_atom_types"], i)
+
+    def __write_data(self, data_file, box_side, blocks, bonds, n_atom_types, replica=None, nbonds=None):
+        # the atoms come in blocks of (positions, molecule, types, images), e.g. the chains and the
+        # obstacles, and the bonds as one array or, with nbonds, as batches, so they are written
+        # without gathering the whole system in memory
+        if nbonds is None:
+            bonds, nbonds = [bonds], len(bonds)
+        ids = None
+        if self.atom_ordering is not None:
+            with self.instrumentation.stage("atom_ordering", replica):
+                positions, molecule, types, images = (np.concatenate(column) for column in zip(*blocks))
+                ordered = reorder_atoms(positions, molecule, types, images, np.concatenate(list(bonds)), box_side,
+                                        self.atom_ordering["curve"], self.atom_ordering["binsize"], self.atom_ordering["renumber"])
+            blocks = [(ordered["positions"], ordered["molecule"], ordered["types"], ordered["images"])]
+            bonds, ids = [ordered["bonds"]], ordered["ids"]
+        natoms = sum(len(block[0]) for block in blocks)
+        with self.instrumentation.stage("write_data", replica, files=[data_file]):
+            with DataFileWriter(data_file, box_side, natoms, nbonds, n_atom_types) as writer:
+                for positions, molecule, types, images in blocks:
+                    writer.atoms(positions, molecule, types, images, ids)
+                for batch in bonds:
+                    writer.bonds(batch)
+
+    def __obstacle_block(self, obstacles):
+        nobstacles = len(obstacles)
+        return obstacles, np.zeros(nobstacles, dtype=int), np.full(nobstacles, 2), np.zeros((nobstacles, 3), dtype=int)
+
+    def __generate_chains(self):
+        generator = ChainGenerator(self.nchain, self.nmonomers, self.rho_star, 0.97, 1.02, self.rng.integers(10000, 100000000),
+                                   self.excluded_volume_cutoff)
+        # a read-only view: the types of the beads take no memory
+        types = np.broadcast_to(1, generator.natoms)
+        nbonds = self.nchain*(self.nmonomers - 1)
+        n_atom_types = 2 if self.type_simulation else 1
+        place_obstacles = self.type_simulation and self.obstacle_placement == "python"
+
+        # one replica at a time, so that only one replica is ever in memory
+        for i in range(self.num_files):
+            with self.instrumentation.stage("generate_chains", i):
+                positions, molecule, images = generator.generate(1)
+            self.chain_report.append(dict(generator.report))
+            data_file = str(self.filename)+"_poly_input_"+str(i)+self.data_extension
+            if place_obstacles:
+                with self.instrumentation.stage("place_obstacles", i):
+                    placement = ObstaclePlacement(generator.box_side, self.sigmaBB, self.sigmaAB, self.sigmaAA, self.rng)
+                    obstacles, report = placement.place(self.n_hs, beads=positions[0])
+                self.obstacle_reports.append(report)
+                blocks = [(positions[0], molecule, types, images[0]), self.__obstacle_block(obstacles)]
+            else:
+                blocks = [(positions[0], molecule, types, images[0])]
+            self.__write_data(data_file, generator.box_side, blocks, generator.bond_batches(), n_atom_types, i, nbonds)
+            # freed before the next replica is grown
+            del positions, images, blocks
+
+    def __tile_chains(self):
+        if self.tile["method"] == "lammps":
+            self.tile_files = [os.path.abspath(self.tile["data_file"])] * self.num_files
+            return
+
+        with self.instrumentation.stage("tile"):
+            tiled = tile_data(self.tile_source, self.tile["k"])
+        n_atom_types = 2 if self.type_simulation else 1
+        if self.type_simulation and self.tile["source_obstacles"] == 0 and self.obstacle_placement == "python":
+            beads = tiled["positions"]
+            self.tile_files = []
             for i in range(self.num_files):
-                with open('def.chain2','w') as fdata:
-                    # First line is a comment line 
-                    fdata.write('Polymer chain definition\n\n')
-                    fdata.write('{}     rhostar\n'.format(self.rho_star))
-                    fdata.write('{}     random # seed (8 digits or less)\n'.format(np.random.randint(10000, 100000000)))
-                    fdata.write('{}     # of sets of chains (blank line + 6 values for each set)\n'.format(1))
-                    fdata.write('{}     molecule tag rule: 0 = by mol, 1 = from 1 end, 2 = from 2 ends\n\n'.format(0))
-                    fdata.write('{}     number of chains\n'.format(self.nchain))
-                    fdata.write('{}     monomers/chain\n'.format(self.nmonomers))
-                    fdata.write('{}     type of monomers (for output into LAMMPS file)\n'.format(1))
-                    fdata.write('{}     type of bonds (for output into LAMMPS file)\n'.format(1))
-                    fdata.write('{}     distance between monomers (in reduced units)\n'.format(0.97))
-                    fdata.write('{}     no distance less than this from site i-1 to i+1 (reduced unit)\n'.format(1.02))
-                
-            
-                os.system("./chain < def.chain2 > "+str(self.filename)+"_poly_input_"+str(i)+".data")
-                with open(str(self.filename)+"_poly_input_"+str(i)+".data", "r") as infile:
-                    lines = infile.readlines()
+                data_file = str(self.filename)+"_poly_input_"+str(i)+self.data_extension
+                with self.instrumentation.stage("place_obstacles", i):
+                    placement = ObstaclePlacement(tiled["box_side"], self.sigmaBB, self.sigmaAB, self.sigmaAA, self.rng)
+                    obstacles, report = placement.place(self.n_hs, beads=beads)
+                self.obstacle_reports.append(report)
+                self.__write_data(data_file, tiled["box_side"],
+                                  [(beads, tiled["molecule"], tiled["types"], tiled["images"]), self.__obstacle_block(obstacles)],
+                                  tiled["bonds"], n_atom_types, i)
+                self.tile_files.append(data_file)
+        else:
+            # nothing differs between the replicas but their seeds: they share one data file
+            data_file = str(self.filename)+"_tiled"+self.data_extension
+            self.__write_data(data_file, tiled["box_side"],
+                              [(tiled["positions"], tiled["molecule"], tiled["types"], tiled["images"])],
+                              tiled["bonds"], n_atom_types)
+            self.tile_files = [data_file] * self.num_files
+
+    def __replica_pushoff_steps(self, report):
+        # chains grown without overlaps only need a short push-off
+        if self.excluded_volume_cutoff is not None and "pushoff_steps" not in self.system_parameters:
+            if sum(report["overlaps"]) == 0:
+                return 10000
+        return self.pushoff_steps
+
+    def __prepare_cached_states(self):
+        chain_seed = self.system_parameters.get("chain_seed", self.rng.integers(10000, 100000000))
+        for i in range(self.num_files):
+            parameters = {"sigma0": self.sigma0, "mass0": self.mass0, "rho_real": self.system_parameters["rho_real"],
+                          "nchain": self.nchain, "nmonomers": self.nmonomers, "type_simulation": self.type_simulation,
+                          "excluded_volume_cutoff": self.excluded_volume_cutoff,
+                          "pushoff_steps": self.system_parameters.get("pushoff_steps"),
+                          "chain_seed": chain_seed, "replica": i}
+            if not self.type_simulation:
+                parameters["low_attraction"] = self.low_attraction
+            # the push-off of the prepare script stops early with adaptive equilibration
+            if self.adaptive_equilibration is not None:
+                parameters["adaptive_equilibration"] = self.adaptive_equilibration
+            key = self.cache.key(parameters)
+            status = self.cache.status(key)
+
+            # only the process that creates the directory of the state prepares it; the others
+            # find it pending, even before it is registered
+            if status is None and not self.cache.claim(key):
+                status = "pending"
+            if status is None:
+                generator = ChainGenerator(self.nchain, self.nmonomers, self.rho_star, 0.97, 1.02, [chain_seed, i],
+                                           self.excluded_volume_cutoff)
+                with self.instrumentation.stage("generate_chains", i):
+                    positions, molecule, images = generator.generate(1)
+                self.chain_report.append(generator.report)
+                # written under temporary names, so that a state is never seen half written
+                temporary = self.cache.temporary(key, "chains.data")
+                self.__write_data(temporary, generator.box_side,
+                                  [(positions[0], molecule, np.broadcast_to(1, generator.natoms), images[0])],
+                                  generator.bond_batches(), 2 if self.type_simulation else 1, i,
+                                  self.nchain*(self.nmonomers - 1))
+                os.replace(temporary, self.cache.path(key, "chains.data"))
+                temporary = self.cache.temporary(key, self.cache.prepare_script)
+                with open(temporary, "w") as lmpScript:
+                    lmpScript.write(self.__prepare_script(self.__replica_pushoff_steps(generator.report)))
+                os.replace(temporary, self.cache.path(key, self.cache.prepare_script))
+                self.cache.register(key, parameters)
+                status = "pending"
+
+            self.cached_states.append({"key": key, "status": status, "directory": self.cache.path(key)})
+            if status == "equilibrated" and self.type_simulation and self.obstacle_placement == "python":
+                self.cached_states[-1]["data_file"] = self.__place_on_checkpoint(key, i)
 
-                with open(str(self.filename)+"_poly_input_"+str(i)+".data", "w") as outfile:
-                    for pos, line in enumerate(lines):
-                        if pos != 18 and pos != 20:
-                            outfile.write(line)
+    def __place_on_checkpoint(self, key, i):
+        # the obstacles are placed without overlaps around the beads of the checkpoint, and
+        # written with them in a data file of the replica
+        data = read_lammps_data(self.cache.path(key, self.cache.checkpoint))
+        box_side = data["hi"][0] - data["lo"][0]
+        beads = data["types"] == 1
+        positions = data["positions"][beads] - (data["lo"] + data["hi"]) / 2.
+        with self.instrumentation.stage("place_obstacles", i):
+            placement = ObstaclePlacement(box_side, self.sigmaBB, self.sigmaAB, self.sigmaAA, self.rng)
+            obstacles, report = placement.place(self.n_hs, beads=positions)
+        self.obstacle_reports.append(report)
+        data_file = str(self.filename)+"_poly_input_"+str(i)+self.data_extension
+        self.__write_data(data_file, box_side,
+                          [(positions, data["molecule"][beads], data["types"][beads], data["images"][beads]),
+                           self.__obstacle_block(obstacles)],
+                          data["bonds"], 2, i)
+        return data_file
 
     def __initialize_lammps_script(self):
-        if self.type_simulation:
-            for i in range(self.num_files):
-                with open("lammps_"+str(self.filename)+"_"+str(i)+".in", "w") as lmpScript:
-                    lmpScript.write("###################\n\n")
-                    lmpScript.write("# LAMMPS script generated from class PolymerSimulation\n\n")
-                    lmpScript.write("dimension 3 \n")
-                    lmpScript.write("atom_style  molecular \n")
-                    lmpScript.write("boundary   p p p \n\n")
-                    lmpScript.write("neighbor 4.0  multi\n")
-                    lmpScript.write("neigh_modify every 2 delay 10 check yes \n\n")
-                    lmpScript.write("read_data "+str(self.filename)+"_poly_input_"+str(i)+".data\n\n")
-                    lmpScript.write("region box block -{} {} -{} {} -{} {}\n".format(*(self.box_side/2.)*np.ones(6)))
-                    lmpScript.write("create_atoms 2 random {} {} box\n\n".format(self.n_hs,np.random.randint(10000, 100000000)))
-                    lmpScript.write("mass 1 {}\n".format(self.massA))
-                    lmpScript.write("mass 2 {}\n\n".format(self.massB))
-                    lmpScript.write("group polymer type 1\n")
-                    lmpScript.write("group HS type 2\n\n")
-                    lmpScript.write("#########################\n")
-                    lmpScript.write("### POLYMER EQUILIBRATION \n")
-                    lmpScript.write("pair_style soft 1.0 \n")
-                    lmpScript.write("pair_coeff * *  0.0  1.0 \n")
-                    lmpScript.write("variable prefactor equal ramp(0,60) \n")
-                    lmpScript.write("fix        1   all adapt 1 pair    soft a * * v_prefactor \n")
-                    lmpScript.write("bond_style     fene \n")
-                    lmpScript.write("bond_coeff 1   30.0    1.5 1.0 1.0 \n ")
-                    lmpScript.write("special_bonds fene \n")
-                    lmpScript.write("reset_timestep 0 \n")
-                    lmpScript.write("timestep   0.001 \n")
-                    lmpScript.write("velocity all create 1.0 49589302   rot yes dist gaussian \n")
-                    lmpScript.write("fix equilibrate1 all nve \n ")
-                    lmpScript.write("fix equilibrate2 all langevin 1.0 1.0 1.0 87708 \n")
-                    lmpScript.write("thermo_style  custom step temp pe ke etotal press\n")
-                    lmpScript.write("thermo 1000\n")
-                    lmpScript.write("run 100000\n")
-                    lmpScript.write("unfix 1 \n")
-                    lmpScript.write("unfix equilibrate1 \n")
-                    lmpScript.write("unfix equilibrate2 \n")
-                    lmpScript.write("# stop minimization \n")
-                    lmpScript.write("#########################################\n")
-                    lmpScript.write("pair_style hybrid/overlay lj/cut {}  lj/cut {}  lj/cut {}\n\n".format(self.cut11,self.cut12,self.cut22))
-                    lmpScript.write("pair_coeff      1 1 lj/cut 1 {} {} {}\n".format(self.epsAA,self.sigmaAA,self.cut11))
-                    lmpScript.write("pair_modify  shift yes\n\n")
-                    lmpScript.write("pair_coeff      1 2 lj/cut 2 {} {} {}\n".format(self.epsAB,self.sigmaAB,self.cut12))
-                    lmpScript.write("pair_modify  shift yes\n\n")
-                    lmpScript.write("pair_coeff      2 2 lj/cut 3 {} {} {}\n".format(self.epsBB,self.sigmaBB,self.cut22))
-                    lmpScript.write("pair_modify  shift yes\n\n")
-                    lmpScript.write("bond_style  fene \n")
-                    lmpScript.write("bond_coeff 1 30.0  1.5  1.0 1.0\n")
-                    lmpScript.write("special_bonds fene\n\n")
-                    lmpScript.write("minimize              0.00000001 0.000000001 10000 100000\n")
-                    lmpScript.write("reset_timestep 0\n")
-                    lmpScript.write("timestep {}\n".format(self.time_step))
-                    lmpScript.write("fix integrator all nve\n")
-                    lmpScript.write("fix dynamics all langevin {} {} {} {}\n".format(self.temperature,self.temperature,self.gamma,np.random.randint(10000, 100000000)))
-                    lmpScript.write("thermo_style  custom step temp pe ke etotal press \n")
-                    lmpScript.write("thermo 1000 \n")
-                    lmpScript.write("run {}\n".format(self.number_of_steps_equilibration))
-                    lmpScript.write("reset_timestep 0\n")
-                    lmpScript.write("dump img all custom 10000 simulation."+str(self.filename)+"_"+str(i)+"_snap id type xs ys zs vx vy vz \n")
-                    lmpScript.write("compute  cmol all chunk/atom molecule \n")
-                    lmpScript.write("compute gyr all gyration/chunk cmol \n")
-                    lmpScript.write("variable  ave equal ave(c_gyr)*{} \n".format(self.sigma0))
-                    lmpScript.write("variable KineticEnergy equal ke  \n")
-                    lmpScript.write("variable PotentialEnergy equal pe \n")
-                    lmpScript.write("variable Temperature equal temp  \n")
-                    lmpScript.write("fix             output all ave/time 20 50 1000 v_Temperature v_KineticEnergy v_PotentialEnergy v_ave file "+str(self.filename)+"_thermo_output_"+str(i)+".dat format %.15g \n\n")
-                    lmpScript.write("thermo_style  custom step temp etotal press v_ave\n")
-                    lmpScript.write("thermo 1000 \n")
-                    lmpScript.write("compute ficoll_msd HS msd \n")
-                    lmpScript.write("fix ficoll_msd HS ave/time 2 6 100 c_ficoll_msd[4] file "+str(self.filename)+"_msd_ficoll_"+str(i)+".dat\n")
-                    lmpScript.write("compute cc1 all chunk/atom molecule \n")
-                    lmpScript.write("compute myChunk all com/chunk cc1 \n")
-                    lmpScript.write("fix myCOM all ave/time 100 1 100 c_myChunk[*] file "+str(self.filename)+"_com_poly_"+str(i)+".dat mode vector\n")
-                    lmpScript.write("compute polymer_msd polymer chunk/atom molecule \n")
-                    lmpScript.write("compute chainMSD polymer msd/chunk polymer_msd  \n")
-                    lmpScript.write("fix polymer_MSDPrint polymer ave/time 1000 1 1000 c_chainMSD[4] file "+str(self.filename)+"_msd_polymer_"+str(i)+".dat mode vector \n")
-                    lmpScript.write("run {}".format(self.number_of_steps))
+        self.lammps_scripts = []
+        for i in range(self.num_files):
+            with self.instrumentation.stage("lammps_script", i):
+                self.lammps_scripts.append(self.__lammps_script(i))
+        if self.script_mode == "partition":
+            labels = [self.partition_label(i) for i in range(self.num_files)]
+            with self.instrumentation.stage("write_script", files=["lammps_"+str(self.filename)+".in"]):
+                self.partition_manifest = write_partition_script("lammps_"+str(self.filename)+".in", self.lammps_scripts, labels)
         else:
             for i in range(self.num_files):
-                with open("lammps_"+str(self.filename)+"_"+str(i)+".in", "w") as lmpScript:
-                    lmpScript.write("###################\n\n")
-                    lmpScript.write("# LAMMPS script generated from class PolymerSimulation\n\n")
-                    lmpScript.write("dimension 3 \n")
-                    lmpScript.write("atom_style  molecular \n")
-                    lmpScript.write("boundary   p p p \n\n")
-                    lmpScript.write("neighbor 4.0  multi\n")
-                    lmpScript.write("neigh_modify every 2 delay 10 check yes \n\n")
-                    lmpScript.write("read_data "+str(self.filename)+"_poly_input_"+str(i)+".data\n\n")
-                    lmpScript.write("mass 1 {}\n".format(self.massA))
-                    lmpScript.write("group polymer type 1\n")
-                    lmpScript.write("#########################\n")
-                    lmpScript.write("### POLYMER EQUILIBRATION \n")
-                    lmpScript.write("pair_style soft 1.0 \n")
-                    lmpScript.write("pair_coeff * *  0.0  1.0 \n")
-                    lmpScript.write("variable prefactor equal ramp(0,60) \n")
-                    lmpScript.write("fix        1   all adapt 1 pair    soft a * * v_prefactor \n")
-                    lmpScript.write("bond_style     fene \n")
-                    lmpScript.write("bond_coeff 1   30.0    1.5 1.0 1.0 \n ")
-                    lmpScript.write("special_bonds fene \n")
-                    lmpScript.write("reset_timestep 0 \n")
-                    lmpScript.write("timestep   0.001 \n")
-                    lmpScript.write("velocity all create 1.0 49589302   rot yes dist gaussian \n")
-                    lmpScript.write("fix equilibrate1 all nve \n ")
-                    lmpScript.write("fix equilibrate2 all langevin 1.0 1.0 1.0 87708 \n")
-                    lmpScript.write("thermo_style  custom step temp pe ke etotal press\n")
-                    lmpScript.write("thermo 1000\n")
-                    lmpScript.write("run 100000\n")
-                    lmpScript.write("unfix 1 \n")
-                    lmpScript.write("unfix equilibrate1 \n")
-                    lmpScript.write("unfix equilibrate2 \n")
-                    lmpScript.write("# stop minimization \n")
-                    lmpScript.write("#########################################\n")
-                    lmpScript.write("pair_style hybrid/overlay lj/cut {} lj/cut {} \n\n".format(self.cut11, 2.5))
-                    lmpScript.write("pair_coeff      1 1 lj/cut 1 {} {} {}\n".format(self.epsAA,self.sigmaAA,self.cut11))
-                    lmpScript.write("pair_modify  shift yes\n\n")
-                    lmpScript.write("pair_coeff      1 1 lj/cut 2 {} 1.0 2.5 \n\n".format(self.low_attraction))
-                    lmpScript.write("bond_style  fene \n")
-                    lmpScript.write("bond_coeff 1 30.0  1.5  1.0 1.0\n")
-                    lmpScript.write("special_bonds fene\n\n")
-                    lmpScript.write("minimize              0.00000001 0.000000001 10000 100000\n")
-                    lmpScript.write("reset_timestep 0\n")
-                    lmpScript.write("timestep {}\n".format(self.time_step))
-                    lmpScript.write("fix integrator all nve\n")
-                    lmpScript.write("fix dynamics all langevin {} {} {} {}\n".format(self.temperature,self.temperature,self.gamma,np.random.randint(10000, 100000000)))
-                    lmpScript.write("thermo_style  custom step temp pe ke etotal press \n")
-                    lmpScript.write("thermo 1000 \n")
-                    lmpScript.write("run {}\n".format(self.number_of_steps_equilibration))
-                    lmpScript.write("reset_timestep 0\n")
-                    lmpScript.write("dump img all custom 10000 simulation."+str(self.filename)+"_"+str(i)+"_snap id type xs ys zs vx vy vz \n")
-                    lmpScript.write("compute  cmol all chunk/atom molecule \n")
-                    lmpScript.write("compute gyr all gyration/chunk cmol \n")
-                    lmpScript.write("variable  ave equal ave(c_gyr)*{} \n".format(self.sigma0))
-                    lmpScript.write("variable KineticEnergy equal ke  \n")
-                    lmpScript.write("variable PotentialEnergy equal pe \n")
-                    lmpScript.write("variable Temperature equal temp  \n")
-                    lmpScript.write("fix             output all ave/time 20 50 1000 v_Temperature v_KineticEnergy v_PotentialEnergy v_ave file "+str(self.filename)+"_thermo_output_"+str(i)+".dat format %.15g \n\n")
-                    lmpScript.write("thermo_style  custom step temp etotal press v_ave\n")
-                    lmpScript.write("thermo 1000 \n")
-                    lmpScript.write("compute cc1 all chunk/atom molecule \n")
-                    lmpScript.write("compute myChunk all com/chunk cc1 \n")
-                    lmpScript.write("fix myCOM all ave/time 100 1 100 c_myChunk[*] file "+str(self.filename)+"_com_poly_"+str(i)+".dat mode vector\n")
-                    lmpScript.write("compute polymer_msd polymer chunk/atom molecule \n")
-                    lmpScript.write("compute chainMSD polymer msd/chunk polymer_msd  \n")
-                    lmpScript.write("fix polymer_MSDPrint polymer ave/time 1000 1 1000 c_chainMSD[4] file "+str(self.filename)+"_msd_polymer_"+str(i)+".dat mode vector \n")
-                    lmpScript.write("run {}".format(self.number_of_steps))
\ No newline at end of file
+                with self.instrumentation.stage("write_script", i, files=["lammps_"+str(self.filename)+"_"+str(i)+".in"]):
+                    with open("lammps_"+str(self.filename)+"_"+str(i)+".in", "w") as lmpScript:
+                        lmpScript.write(self.lammps_scripts[i])
+
+    def partition_label(self, i):
+        """
+        Label of replica i in the manifest of a multi-partition script: the filename, the
+        replica index and the parameters that are usually swept.
+        """
+        label = {"filename": str(self.filename), "replica": i}
+        for key in ["rho_real", "phi_hs", "nchain", "nmonomers"]:
+            value = self.system_parameters[key]
+            label[key] = value.item() if isinstance(value, np.generic) else value
+        return label
+
+    def __lammps_script(self, i):
+        lmpScript = io.StringIO()
+        self.__write_header(lmpScript)
+        if self.tile is not None:
+            # the tiled chains are equilibrated already: new velocities instead of the push-off
+            create_obstacles = self.type_simulation and self.tile["source_obstacles"] == 0 and self.obstacle_placement == "lammps"
+            replicate = self.tile["k"] if self.tile["method"] == "lammps" else None
+            self.__write_system(lmpScript, self.tile_files[i], create_obstacles, overlap=True, replicate=replicate)
+            lmpScript.write("velocity all create {} {} mom yes rot yes dist gaussian\n".format(self.temperature, self.rng.integers(10000, 100000000)))
+            self.__write_interactions(lmpScript)
+            if self.type_simulation:
+                lmpScript.write("minimize              0.00000001 0.000000001 10000 100000\n")
+            self.__write_decorrelation(lmpScript)
+        elif self.state_cache is None:
+            self.__write_system(lmpScript, str(self.filename)+"_poly_input_"+str(i)+self.data_extension, self.obstacle_placement == "lammps")
+            steps = self.__replica_pushoff_steps(self.chain_report[i]) if self.chain_report else self.pushoff_steps
+            self.__write_pushoff(lmpScript, str(self.filename)+"_equilibration_report_"+str(i)+".dat", steps, self.type_simulation)
+            self.__write_interactions(lmpScript)
+            lmpScript.write("minimize              0.00000001 0.000000001 10000 100000\n")
+        else:
+            # the push-off and the polymer minimization were done by the prepare script
+            if "data_file" in self.cached_states[i]:
+                self.__write_system(lmpScript, self.cached_states[i]["data_file"], False)
+            else:
+                state = self.cache.path(self.cached_states[i]["key"], self.cache.checkpoint)
+                self.__write_system(lmpScript, state, self.type_simulation, overlap=True)
+            self.__write_interactions(lmpScript)
+            if self.type_simulation:
+                lmpScript.write("minimize              0.00000001 0.000000001 10000 100000\n")
+        self.__write_equilibration(lmpScript, str(self.filename)+"_equilibration_report_"+str(i)+".dat", self.state_cache is not None or self.tile is not None)
+        self.__write_production(lmpScript, i)
+        return lmpScript.getvalue()
+
+    def __prepare_script(self, pushoff_steps):
+        lmpScript = io.StringIO()
+        self.__write_header(lmpScript)
+        self.__write_system(lmpScript, "chains.data", False)
+        self.__write_pushoff(lmpScript, "equilibration_report.dat", pushoff_steps)
+        self.__write_interactions(lmpScript, polymer_only=True)
+        lmpScript.write("minimize              0.00000001 0.000000001 10000 100000\n")
+        lmpScript.write("write_restart {}\n".format(self.cache.restart))
+        # the checkpoint marks the state as equilibrated: it appears, renamed, only once complete
+        lmpScript.write("write_data {}.tmp nocoeff\n".format(self.cache.checkpoint))
+        lmpScript.write("shell mv {0}.tmp {0}\n".format(self.cache.checkpoint))
+        return lmpScript.getvalue()
+
+    def __write_header(self, lmpScript):
+        lmpScript.write("###################\n\n")
+        lmpScript.write("# LAMMPS script generated from class PolymerSimulation\n\n")
+        lmpScript.write("dimension 3 \n")
+        lmpScript.write("atom_style  molecular \n")
+        lmpScript.write("boundary   p p p \n\n")
+        if self.performance_profile is None:
+            lmpScript.write("neighbor 4.0  multi\n")
+            lmpScript.write("neigh_modify every 2 delay 10 check yes \n\n")
+        else:
+            # the rest of the profile needs the atom types, and is written after the atoms
+            settings = self.performance_profile.settings
+            lmpScript.write("neighbor {} {}\n\n".format(settings["skin"], settings["neighbor_style"]))
+        if self.atom_ordering is not None:
+            lmpScript.write("atom_modify sort {} {}\n\n".format(self.atom_ordering["sort_every"], self.atom_ordering["binsize"]))
+        elif self.performance_profile is not None:
+            # with the short skin, the default sort bins (half the neighbor cutoff) are too many in dilute boxes
+            lmpScript.write("atom_modify sort 1000 {}\n\n".format(self.performance_profile.settings["binsize"]))
+
+    def __write_system(self, lmpScript, data_file, create_obstacles, overlap=False, replicate=None):
+        if replicate is not None:
+            extra = " extra/atom/types 1" if self.type_simulation and self.tile_source["n_atom_types"] < 2 else ""
+            lmpScript.write("read_data "+str(data_file)+extra+"\n")
+            lmpScript.write("replicate {0} {0} {0}\n\n".format(replicate))
+        else:
+            lmpScript.write("read_data "+str(data_file)+"\n\n")
+        if self.type_simulation:
+            if create_obstacles:
+                lmpScript.write("region box block {0} {1} {0} {1} {0} {1}\n".format(*self.box_bounds))
+                if overlap:
+                    lmpScript.write("create_atoms 2 random {} {} box overlap {} maxtry 1000\n\n".format(self.n_hs,self.rng.integers(10000, 100000000),self.sigmaAB))
+                else:
+                    lmpScript.write("create_atoms 2 random {} {} box\n\n".format(self.n_hs,self.rng.integers(10000, 100000000)))
+            lmpScript.write("mass 1 {}\n".format(self.massA))
+            lmpScript.write("mass 2 {}\n\n".format(self.massB))
+            lmpScript.write("group polymer type 1\n")
+            lmpScript.write("group HS type 2\n\n")
+            if create_obstacles and overlap:
+                # create_atoms only warns when it cannot insert every obstacle without overlaps
+                # the number is set outside the quotes, so that the scripts of a partitioned run can be merged
+                lmpScript.write("variable n_hs equal {}\n".format(self.n_hs))
+                lmpScript.write('if "$(count(HS)) < ${n_hs}" then "print \'only $(count(HS)) of ${n_hs} obstacles were inserted\'" "quit 1"\n\n')
+        else:
+            lmpScript.write("mass 1 {}\n".format(self.massA))
+            lmpScript.write("group polymer type 1\n")
+        if self.performance_profile is not None:
+            groups = {1: "polymer"}
+            if self.type_simulation and (create_obstacles or self.obstacle_placement == "python"):
+                groups[2] = "HS"
+            lmpScript.write(self.performance_profile.commands(groups))
+            lmpScript.write("\n")
+
+    def __write_report(self, lmpScript, report, stage, cap, first):
+        # the report is started by the first stage of the script, and appended to by the others
+        if first:
+            lmpScript.write("print \"# stage steps_used max_steps\" file {} screen no\n".format(report))
+        # the cap is set outside the quotes, so that the scripts of a partitioned run can be merged
+        lmpScript.write("variable report_cap equal {}\n".format(cap))
+        lmpScript.write("print \"{} $(step) ${{report_cap}}\" append {} screen no\n".format(stage, report))
+
+    def __write_pushoff(self, lmpScript, report, steps, obstacles=False):
+        lmpScript.write("#########################\n")
+        lmpScript.write("### POLYMER EQUILIBRATION \n")
+        lmpScript.write("pair_style soft 1.0 \n")
+        lmpScript.write("pair_coeff * *  0.0  1.0 \n")
+        if obstacles:
+            # the obstacles already in the box keep their size, so that the beads do not diffuse into them
+            lmpScript.write("pair_coeff 1 2  0.0  {} \n".format(self.sigmaAB))
+            lmpScript.write("pair_coeff 2 2  0.0  {} \n".format(self.sigmaBB))
+        lmpScript.write("variable prefactor equal ramp(0,60) \n")
+        lmpScript.write("fix        1   all adapt 1 pair    soft a * * v_prefactor \n")
+        lmpScript.write("bond_style     fene \n")
+        lmpScript.write("bond_coeff 1   30.0    1.5 1.0 1.0 \n ")
+        lmpScript.write("special_bonds fene \n")
+        lmpScript.write("reset_timestep 0 \n")
+        lmpScript.write("timestep   0.001 \n")
+        lmpScript.write("velocity all create 1.0 49589302   rot yes dist gaussian \n")
+        lmpScript.write("fix equilibrate1 all nve \n ")
+        lmpScript.write("fix equilibrate2 all langevin 1.0 1.0 1.0 87708 \n")
+        lmpScript.write("thermo_style  custom step temp pe ke etotal press\n")
+        lmpScript.write("thermo 1000\n")
+        if self.adaptive_equilibration:
+            # stop as soon as no pair is closer than min_distance
+            settings = self.adaptive_equilibration
+            lmpScript.write("compute pushoff_pairs all pair/local dist \n")
+            lmpScript.write("compute pushoff_min all reduce min c_pushoff_pairs \n")
+            lmpScript.write("variable pushoff_done equal (step>={})&&(c_pushoff_min>{}) \n".format(settings["min_steps"], settings["min_distance"]))
+            lmpScript.write("fix pushoff_halt all halt {} v_pushoff_done == 1 error continue \n".format(settings["check_every"]))
+            lmpScript.write("run {}\n".format(steps))
+            self.__write_report(lmpScript, report, "pushoff", steps, True)
+            lmpScript.write("unfix pushoff_halt \n")
+            lmpScript.write("uncompute pushoff_min \n")
+            lmpScript.write("uncompute pushoff_pairs \n")
+        else:
+            lmpScript.write("run {}\n".format(steps))
+        lmpScript.write("unfix 1 \n")
+        lmpScript.write("unfix equilibrate1 \n")
+        lmpScript.write("unfix equilibrate2 \n")
+        lmpScript.write("# stop minimization \n")
+        lmpScript.write("#########################################\n")
+
+    def __write_interactions(self, lmpScript, polymer_only=False):
+        if self.type_simulation and polymer_only:
+            lmpScript.write("pair_style lj/cut {}\n\n".format(self.cut11))
+            lmpScript.write("pair_coeff      * * 0.0 {} {}\n".format(self.sigmaAA,self.cut11))
+            lmpScript.write("pair_coeff      1 1 {} {} {}\n".format(self.epsAA,self.sigmaAA,self.cut11))
+            lmpScript.write("pair_modify  shift yes\n\n")
+        elif self.type_simulation:
+            lmpScript.write("pair_style hybrid/overlay lj/cut {}  lj/cut {}  lj/cut {}\n\n".format(self.cut11,self.cut12,self.cut22))
+            lmpScript.write("pair_coeff      1 1 lj/cut 1 {} {} {}\n".format(self.epsAA,self.sigmaAA,self.cut11))
+            lmpScript.write("pair_modify  shift yes\n\n")
+            lmpScript.write("pair_coeff      1 2 lj/cut 2 {} {} {}\n".format(self.epsAB,self.sigmaAB,self.cut12))
+            lmpScript.write("pair_modify  shift yes\n\n")
+            lmpScript.write("pair_coeff      2 2 lj/cut 3 {} {} {}\n".format(self.epsBB,self.sigmaBB,self.cut22))
+            lmpScript.write("pair_modify  shift yes\n\n")
+        else:
+            lmpScript.write("pair_style hybrid/overlay lj/cut {} lj/cut {} \n\n".format(self.cut11, 2.5))
+            lmpScript.write("pair_coeff      1 1 lj/cut 1 {} {} {}\n".format(self.epsAA,self.sigmaAA,self.cut11))
+            lmpScript.write("pair_modify  shift yes\n\n")
+            lmpScript.write("pair_coeff      1 1 lj/cut 2 {} 1.0 2.5 \n\n".format(self.low_attraction))
+        lmpScript.write("bond_style  fene \n")
+        lmpScript.write("bond_coeff 1 30.0  1.5  1.0 1.0\n")
+        lmpScript.write("special_bonds fene\n\n")
+
+    def __write_decorrelation(self, lmpScript):
+        # a short thermostatted run, so that the copies of the tiled box drift apart
+        if not self.tile["decorrelation_steps"]:
+            return
+        lmpScript.write("reset_timestep 0\n")
+        lmpScript.write("timestep {}\n".format(self.time_step))
+        lmpScript.write("fix decorrelate1 all nve\n")
+        lmpScript.write("fix decorrelate2 all langevin {} {} {} {}\n".format(self.temperature,self.temperature,self.gamma,self.rng.integers(10000, 100000000)))
+        lmpScript.write("run {}\n".format(self.tile["decorrelation_steps"]))
+        lmpScript.write("unfix decorrelate2\n")
+        lmpScript.write("unfix decorrelate1\n")
+
+    def __write_equilibration(self, lmpScript, report, first_report):
+        lmpScript.write("reset_timestep 0\n")
+        lmpScript.write("timestep {}\n".format(self.time_step))
+        lmpScript.write("fix integrator all nve\n")
+        lmpScript.write("fix dynamics all langevin {} {} {} {}\n".format(self.temperature,self.temperature,self.gamma,self.rng.integers(10000, 100000000)))
+        lmpScript.write("thermo_style  custom step temp pe ke etotal press \n")
+        lmpScript.write("thermo 1000 \n")
+        if self.adaptive_equilibration:
+            # block averages of pe and Rg over check_every steps; the window of the last two blocks
+            # gives the previous block, and the run stops when both drift less than tolerance
+            settings = self.adaptive_equilibration
+            check = settings["check_every"]
+            lmpScript.write("compute eq_cmol all chunk/atom molecule \n")
+            lmpScript.write("compute eq_gyr all gyration/chunk eq_cmol \n")
+            lmpScript.write("variable eq_pe equal pe \n")
+            lmpScript.write("variable eq_rg equal ave(c_eq_gyr) \n")
+            lmpScript.write("fix eq_block all ave/time {} 10 {} v_eq_pe v_eq_rg \n".format(check//10, check))
+            lmpScript.write("fix eq_window all ave/time {} 10 {} v_eq_pe v_eq_rg ave window 2 \n".format(check//10, check))
+            lmpScript.write("variable eq_pe_drift equal 2*abs(f_eq_block[1]-f_eq_window[1])/(abs(f_eq_block[1])+1e-10) \n")
+            lmpScript.write("variable eq_rg_drift equal 2*abs(f_eq_block[2]-f_eq_window[2])/(abs(f_eq_block[2])+1e-10) \n")
+            lmpScript.write("variable eq_done equal (step>={})&&(v_eq_pe_drift<{})&&(v_eq_rg_drift<{}) \n".format(max(settings["min_steps"], 2*check), settings["tolerance"], settings["tolerance"]))
+            lmpScript.write("fix eq_halt all halt {} v_eq_done == 1 error continue \n".format(check))
+            lmpScript.write("run {}\n".format(self.number_of_steps_equilibration))
+            self.__write_report(lmpScript, report, "equilibration", self.number_of_steps_equilibration, first_report)
+            lmpScript.write("unfix eq_halt \n")
+            lmpScript.write("unfix eq_window \n")
+            lmpScript.write("unfix eq_block \n")
+            lmpScript.write("uncompute eq_gyr \n")
+            lmpScript.write("uncompute eq_cmol \n")
+        else:
+            lmpScript.write("run {}\n".format(self.number_of_steps_equilibration))
+
+    def __write_production(self, lmpScript, i):
+        settings = self.diagnostics.settings
+        log = settings["msd_sampling"] == "log"
+        lmpScript.write("reset_timestep 0\n")
+        if settings["dump"] is not None:
+            snap = self.diagnostics.dump_name("simulation."+str(self.filename)+"_"+str(i)+"_snap")
+            lmpScript.write("dump img all custom {} {} id type xs ys zs vx vy vz \n".format(settings["dump"]["every"], snap))
+        lmpScript.write("compute  cmol all chunk/atom molecule \n")
+        lmpScript.write("compute gyr all gyration/chunk cmol \n")
+        lmpScript.write("variable  ave equal ave(c_gyr)*{} \n".format(self.sigma0))
+        lmpScript.write("variable KineticEnergy equal ke  \n")
+        lmpScript.write("variable PotentialEnergy equal pe \n")
+        lmpScript.write("variable Temperature equal temp  \n")
+        if settings["thermo"] is not None:
+            lmpScript.write("fix             output all ave/time {every} {repeat} {freq} ".format(**settings["thermo"])+"v_Temperature v_KineticEnergy v_PotentialEnergy v_ave file "+str(self.filename)+"_thermo_output_"+str(i)+".dat format %.15g \n\n")
+        lmpScript.write("thermo_style  custom step temp etotal press v_ave\n")
+        lmpScript.write("thermo 1000 \n")
+        if log:
+            # next step of the log-spaced sampling: log_start, 2*log_start, ..., 9*log_start, 10*log_start, ...
+            lmpScript.write("variable msd_times equal logfreq({},9,10) \n".format(settings["log_start"]))
+        if self.type_simulation and settings["obstacle_msd"] is not None:
+            lmpScript.write("compute ficoll_msd HS msd \n")
+            if log:
+                lmpScript.write("fix ficoll_msd HS print v_msd_times \"$(step) $(c_ficoll_msd[4])\" file "+str(self.filename)+"_msd_ficoll_"+str(i)+".dat screen no title \"# step msd\" \n")
+            else:
+                lmpScript.write("fix ficoll_msd HS ave/time {every} {repeat} {freq} c_ficoll_msd[4] file ".format(**settings["obstacle_msd"])+str(self.filename)+"_msd_ficoll_"+str(i)+".dat\n")
+        if settings["com"] is not None:
+            lmpScript.write("compute cc1 all chunk/atom molecule \n")
+            lmpScript.write("compute myChunk all com/chunk cc1 \n")
+            lmpScript.write("fix myCOM all ave/time {every} {repeat} {freq} c_myChunk[*] file ".format(**settings["com"])+str(self.filename)+"_com_poly_"+str(i)+".dat mode vector\n")
+        if settings["polymer_msd"] is not None:
+            lmpScript.write("compute polymer_msd polymer chunk/atom molecule \n")
+            lmpScript.write("compute chainMSD polymer msd/chunk polymer_msd  \n")
+            if log:
+                # one value per step: the MSD averaged over the chains
+                lmpScript.write("variable chain_msd equal ave(c_chainMSD[4]) \n")
+                lmpScript.write("fix polymer_MSDPrint polymer print v_msd_times \"$(step) $(v_chain_msd)\" file "+str(self.filename)+"_msd_polymer_"+str(i)+".dat screen no title \"# step msd\" \n")
+            else:
+                lmpScript.write("fix polymer_MSDPrint polymer ave/time {every} {repeat} {freq} c_chainMSD[4] file ".format(**settings["polymer_msd"])+str(self.filename)+"_msd_polymer_"+str(i)+".dat mode vector \n")
+        lmpScript.write("run {}".format(self.number_of_steps))
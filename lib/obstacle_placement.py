@@ -0,0 +1,177 @@
+import time
+
+import numpy as np
+
+from lib.cell_list import CellList
+
+
+class ObstaclePlacement:
+    """
+    This is the class ObstaclePlacement. It inserts hard sphere obstacles in the periodic box
+    without overlaps, among themselves or with the polymer beads, by random sequential addition
+    accelerated with cell lists. Candidates are drawn in batches and tested at once against the
+    obstacles and beads already placed.
+
+    Random sequential addition jams near a packing fraction of 0.38, and becomes slow well before.
+    When it stalls, the remaining obstacles are inserted with a smaller diameter and then
+    compressed back to sigma_obstacle: every sweep pushes the overlapping pairs apart, as a
+    steepest descent of a harmonic overlap energy, until no overlap is left.
+
+
+    Parameters
+    ----------
+    box_side
+        Side of the cubic box, centered at the origin.
+    sigma_obstacle
+        Diameter of the obstacles, i.e. the smallest distance between two obstacle centers.
+    sigma_contact
+        Smallest distance between an obstacle center and a bead.
+    sigma_bead
+        Diameter of the beads.
+    rng
+        A numpy random Generator.
+    """
+
+    def __init__(self, box_side, sigma_obstacle, sigma_contact, sigma_bead=1.0, rng=None):
+        self.box_side = box_side
+        self.sigma_obstacle = sigma_obstacle
+        self.sigma_contact = sigma_contact
+        self.sigma_bead = sigma_bead
+        self.rng = np.random.default_rng(rng)
+
+    def __random_points(self, n):
+        return self.rng.uniform(-self.box_side / 2., self.box_side / 2., (n, 3))
+
+    def __accept_batch(self, candidates, obstacles, beads, diameter, contact):
+        free = ~obstacles.overlaps(candidates, diameter)
+        if beads is not None:
+            free &= ~beads.overlaps(candidates, contact)
+        candidates = candidates[free]
+
+        # candidates of the same batch must not overlap each other: keep the first of each pair
+        batch = CellList(self.box_side, diameter)
+        batch.insert(candidates)
+        first, second, _ = batch.pairs(diameter)
+        keep = np.ones(len(candidates), dtype=bool)
+        keep[second] = False
+        return candidates[keep]
+
+    def __add_sequentially(self, n, obstacles, beads, diameter, contact, max_attempts):
+        attempts = 0
+        placed = 0
+        while placed < n and attempts < max_attempts:
+            batch = int(min(max(2 * (n - placed), 64), 65536))
+            accepted = self.__accept_batch(self.__random_points(batch), obstacles, beads, diameter, contact)
+            accepted = accepted[:n - placed]
+            obstacles.insert(accepted)
+            placed += len(accepted)
+            attempts += batch
+        return placed, attempts
+
+    def __relax(self, positions, beads, sweeps, margin=1.02):
+        # pairs are pushed out to a slightly larger distance, so that they do not creep
+        # towards contact while their neighbors push them back
+        reach = margin * self.sigma_obstacle
+        for sweep in range(1, sweeps + 1):
+            shift = np.zeros_like(positions)
+            obstacles = CellList(self.box_side, reach)
+            obstacles.insert(positions)
+            first, second, distance = obstacles.pairs(reach)
+            overlapping = np.count_nonzero(distance < self.sigma_obstacle)
+            delta = positions[second] - positions[first]
+            delta -= self.box_side * np.rint(delta / self.box_side)
+            # each obstacle of a pair takes half of the way out
+            push = (0.5 * (reach - distance) / np.maximum(distance, 1e-12))[:, None] * delta
+            for axis in range(3):
+                shift[:, axis] -= np.bincount(first, push[:, axis], minlength=len(positions))
+                shift[:, axis] += np.bincount(second, push[:, axis], minlength=len(positions))
+
+            if beads is not None:
+                query_index, point_index, distance = beads.query(positions, self.sigma_contact)
+                overlapping += len(distance)
+                delta = positions[query_index] - beads.points[point_index]
+                delta -= self.box_side * np.rint(delta / self.box_side)
+                push = ((margin * self.sigma_contact - distance) / np.maximum(distance, 1e-12))[:, None] * delta
+                for axis in range(3):
+                    shift[:, axis] += np.bincount(query_index, push[:, axis], minlength=len(positions))
+
+            if overlapping == 0:
+                return positions, sweep - 1, 0
+            length = np.linalg.norm(shift, axis=1)
+            largest = 0.25 * self.sigma_obstacle
+            shift[length > largest] *= (largest / length[length > largest])[:, None]
+            positions = positions + shift
+            positions -= self.box_side * np.rint(positions / self.box_side)
+        return positions, sweeps, overlapping
+
+    def place(self, n_hs, beads=None, max_attempts=None, compression=True, max_sweeps=1000):
+        """
+        Places n_hs obstacles.
+
+
+        Parameters
+        ----------
+        n_hs
+            Number of obstacles.
+        beads
+            Array of shape (nbeads, 3) with the positions of the polymer beads, if any.
+        max_attempts
+            Number of random candidates drawn before random sequential addition is considered
+            stalled. By default 200 per obstacle.
+        compression
+            If True, the obstacles that could not be added are inserted smaller and compressed
+            back to full size. If False, fewer than n_hs obstacles may be returned.
+        max_sweeps
+            Largest number of compression sweeps.
+
+        Returns
+        -------
+        positions
+            Array of shape (n, 3) with the obstacle centers.
+        report
+            A dictionary with the number of obstacles placed by random sequential addition, the
+            packing fraction reached by it and at the end, the number of candidates drawn, the
+            insertion rate, the number of compression sweeps and the overlaps left after them.
+        """
+        start = time.perf_counter()
+        max_attempts = 200 * n_hs if max_attempts is None else max_attempts
+        bead_list = None
+        if beads is not None and len(beads) > 0:
+            bead_list = CellList(self.box_side, self.sigma_contact)
+            bead_list.insert(beads)
+
+        obstacles = CellList(self.box_side, self.sigma_obstacle)
+        placed, attempts = self.__add_sequentially(n_hs, obstacles, bead_list, self.sigma_obstacle,
+                                                   self.sigma_contact, max_attempts)
+        rsa_placed = placed
+        diameter = self.sigma_obstacle
+        sweeps = 0
+        overlaps = 0
+
+        if placed < n_hs and compression:
+            while placed < n_hs:
+                diameter *= 0.9
+                added, tried = self.__add_sequentially(n_hs - placed, obstacles, bead_list, diameter,
+                                                       (diameter + self.sigma_bead) / 2., max_attempts)
+                placed += added
+                attempts += tried
+            positions, sweeps, overlaps = self.__relax(obstacles.points[:placed].copy(), bead_list, max_sweeps)
+        else:
+            positions = obstacles.points[:placed].copy()
+
+        elapsed = time.perf_counter() - start
+        volume = self.box_side ** 3.
+        report = {
+            "requested": n_hs,
+            "placed": placed,
+            "rsa_placed": rsa_placed,
+            "rsa_packing_fraction": rsa_placed * np.pi * self.sigma_obstacle ** 3. / 6. / volume,
+            "packing_fraction": placed * np.pi * self.sigma_obstacle ** 3. / 6. / volume,
+            "attempts": attempts,
+            "acceptance": placed / attempts if attempts else 1.0,
+            "insertions_per_second": placed / elapsed if elapsed > 0 else float("inf"),
+            "compression_sweeps": sweeps,
+            "overlaps": overlaps,
+            "seconds": elapsed,
+        }
+        return positions, report
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+def _interleave(axes, bits):
+    # key whose bits are, from the most significant, bit b of x, y and z for b = bits-1 ... 0
+    key = np.zeros(len(axes[0]), dtype=np.uint64)
+    for bit in range(bits - 1, -1, -1):
+        for axis in axes:
+            key = (key << np.uint64(1)) | ((axis >> np.uint64(bit)) & np.uint64(1))
+    return key
+
+
+def _hilbert_transpose(axes, bits):
+    # Skilling's AxesToTranspose (AIP Conf. Proc. 707, 381 (2004)), on every point at once
+    x = [axis.copy() for axis in axes]
+    q = np.uint64(1) << np.uint64(bits - 1)
+    while q > 1:
+        p = q - np.uint64(1)
+        for i in range(3):
+            high = (x[i] & q) != 0
+            x[0][high] ^= p
+            swap = (x[0] ^ x[i]) & p
+            swap[high] = 0
+            x[0] ^= swap
+            x[i] ^= swap
+        q >>= np.uint64(1)
+    # Gray encode
+    for i in range(1, 3):
+        x[i] ^= x[i - 1]
+    t = np.zeros_like(x[0])
+    q = np.uint64(1) << np.uint64(bits - 1)
+    while q > 1:
+        t[(x[2] & q) != 0] ^= q - np.uint64(1)
+        q >>= np.uint64(1)
+    return [axis ^ t for axis in x]
+
+
+def curve_keys(positions, box_side, curve="hilbert", bits=10):
+    """
+    Index of every position along a Morton (Z-order) or Hilbert curve that fills the cubic
+    box, centered at the origin, with 2**bits cells per side. Points close along the curve
+    are close in space; the Hilbert curve has no long jumps between consecutive cells.
+    """
+    if curve not in ["morton", "hilbert"]:
+        raise ValueError("curve must be 'morton' or 'hilbert'")
+    if not 1 <= bits <= 21:
+        raise ValueError("bits must be between 1 and 21")
+    cells = np.floor((np.asarray(positions) + box_side / 2.) / box_side * 2**bits).astype(np.int64)
+    cells = np.clip(cells, 0, 2**bits - 1).astype(np.uint64)
+    axes = [cells[:, 0], cells[:, 1], cells[:, 2]]
+    if curve == "hilbert":
+        axes = _hilbert_transpose(axes, bits)
+    return _interleave(axes, bits)
+
+
+def curve_bits(box_side, cell):
+    """Smallest number of bits whose curve cells are not wider than cell, at most 21."""
+    return int(np.clip(np.ceil(np.log2(max(box_side / cell, 1.))), 1, 21))
+
+
+def reorder_atoms(positions, molecule, types, images, bonds, box_side, curve="hilbert", cell=1.0, renumber=False):
+    """
+    Sorts the atoms of a system along a space-filling curve, so that atoms close in the
+    data file are close in space, and LAMMPS, which stores the atoms of each rank in the
+    order they are read, starts with a local memory layout.
+
+    Parameters
+    ----------
+    positions, molecule, types, images, bonds
+        The system, as given to write_lammps_data, with atom i having ID i+1.
+    box_side
+        Side of the cubic box, centered at the origin.
+    curve
+        "hilbert" or "morton".
+    cell
+        Width of the curve cells, e.g. the neighbor cutoff of the beads.
+    renumber
+        If False, the atoms keep their IDs, which are written in the new order, and the bonds
+        do not change. If True, the atoms are renumbered along the curve and the bonds are
+        remapped to the new IDs.
+
+    Returns
+    -------
+    reordered
+        A dictionary with the reordered arrays positions, molecule, types, images, the atom
+        "ids" in file order, and the bonds.
+    """
+    order = np.argsort(curve_keys(positions, box_side, curve, curve_bits(box_side, cell)), kind="stable")
+    ids = order + 1
+    if renumber:
+        new_id = np.empty(len(order), dtype=np.int64)
+        new_id[order] = np.arange(1, len(order) + 1)
+        bonds = new_id[np.asarray(bonds) - 1]
+        ids = np.arange(1, len(order) + 1)
+    return {"positions": positions[order], "molecule": molecule[order], "types": types[order],
+            "images": images[order], "ids": ids, "bonds": bonds}
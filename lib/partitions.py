@@ -0,0 +1,126 @@
+import json
+import re
+
+# a quoted argument, kept whole as LAMMPS does, a run of whitespace, or a word
+_TOKENS = re.compile(r'"""[^\n]*?"""|"[^"\n]*"|\'[^\'\n]*\'|\s+|[^\s"\']+|["\']')
+
+
+def merge_scripts(scripts):
+    """
+    Merges LAMMPS scripts that differ only in some of their words (data file names, seeds,
+    number of obstacles, ...) into a single script for a multi-partition run. Every word that
+    changes from one script to another is replaced by a world-style variable, whose value in
+    partition k is the word of scripts[k]. Words that change in the same way share a variable.
+    A quoted argument is a single word, and LAMMPS does not substitute variables inside
+    quotes, so scripts whose quoted arguments differ cannot be merged: such values must be
+    set with a variable command outside the quotes and referenced inside them.
+
+
+    Parameters
+    ----------
+    scripts
+        A list with the text of each script, one per partition.
+
+    Returns
+    -------
+    text
+        The merged script, without the variable definitions.
+    variables
+        A dictionary from variable name to the list of its values, one per partition.
+    """
+    split = [script.split("\n") for script in scripts]
+    if len(set(len(lines) for lines in split)) > 1:
+        raise ValueError("scripts have different numbers of lines and cannot be merged")
+
+    variables = {}
+    names = {}
+    merged = []
+    for number, lines in enumerate(zip(*split)):
+        if len(set(lines)) == 1:
+            merged.append(lines[0])
+            continue
+        words = [_TOKENS.findall(line) for line in lines]
+        if len(set(len(line) for line in words)) > 1:
+            raise ValueError("line {} differs in structure between scripts: {!r}".format(number + 1, lines[0]))
+        line = []
+        for values in zip(*words):
+            if len(set(values)) == 1:
+                line.append(values[0])
+                continue
+            if any(value[:1] in ("\"", "'") for value in values):
+                raise ValueError("line {} differs inside quotes between scripts: {!r}".format(number + 1, lines[0]))
+            if values not in names:
+                names[values] = "p{}".format(len(names) + 1)
+                variables[names[values]] = list(values)
+            line.append("${" + names[values] + "}")
+        merged.append("".join(line))
+    return "\n".join(merged), variables
+
+
+def write_partition_script(path, scripts, labels, directories=None, manifest_path=None, ranks_per_partition=1):
+    """
+    Writes one LAMMPS input script that runs all the given scripts as partitions of a single
+    launch, together with a JSON manifest mapping each partition to its label and values.
+    The script is run with::
+
+      mpirun -np <partitions*ranks> lmp -partition <partitions>x<ranks> -in <path>
+
+
+    Parameters
+    ----------
+    path
+        Name of the merged script.
+    scripts
+        A list with the text of each script, one per partition.
+    labels
+        A list with a label for each partition, for example the parameter point and replica.
+        Labels must be JSON serializable.
+    directories
+        Optional list with the working directory of each partition. When given, each partition
+        changes to its directory (shell cd) before reading any file.
+    manifest_path
+        Name of the manifest, by default path with the extension .json instead of .in.
+    ranks_per_partition
+        MPI ranks of each partition, used for the launch command in the manifest.
+
+    Returns
+    -------
+    manifest
+        The dictionary written to the manifest.
+    """
+    text, variables = merge_scripts(scripts)
+    npartitions = len(scripts)
+    launch = "mpirun -np {} lmp -partition {}x{} -in {}".format(npartitions * ranks_per_partition, npartitions,
+                                                               ranks_per_partition, path)
+
+    with open(path, "w") as lmpScript:
+        lmpScript.write("###################\n\n")
+        lmpScript.write("# LAMMPS multi-partition script generated from class PolymerSimulation\n")
+        lmpScript.write("# {}\n\n".format(launch))
+        lmpScript.write("variable partition world {}\n".format(" ".join(str(k) for k in range(npartitions))))
+        if directories is not None:
+            lmpScript.write("variable workdir world {}\n".format(" ".join(directories)))
+            lmpScript.write("shell cd ${workdir}\n")
+        for name, values in variables.items():
+            lmpScript.write("variable {} world {}\n".format(name, " ".join(values)))
+        lmpScript.write("\n")
+        lmpScript.write(text)
+        lmpScript.write("\n")
+
+    manifest = {
+        "script": path,
+        "launch": launch,
+        "partitions": [],
+    }
+    for k in range(npartitions):
+        partition = {"partition": k, "label": labels[k],
+                     "variables": {name: values[k] for name, values in variables.items()}}
+        if directories is not None:
+            partition["directory"] = directories[k]
+        manifest["partitions"].append(partition)
+
+    if manifest_path is None:
+        manifest_path = re.sub(r"\.in$", "", path) + ".json"
+    with open(manifest_path, "w") as fmanifest:
+        json.dump(manifest, fmanifest, indent=2)
+    return manifest
@@ -0,0 +1,151 @@
+import numpy as np
+
+
+class PerformanceProfile:
+    """
+    This is the class PerformanceProfile. It chooses the neighbor list, communication and load
+    balancing settings of a LAMMPS script from the interactions and the composition of the
+    system, instead of using the same settings for every system. With obstacles, the obstacle
+    cutoff is more than ten times the bead cutoff, so the neighbor lists are built per type
+    (neighbor multi), the ghost atoms are communicated per type, and the subdomains are balanced
+    with a per-type weight, the expected cost of an atom of each type from its neighbors and
+    bonds. In dilute boxes an obstacle can cost less than a bead, whose bond and chain
+    neighbors dominate. The neighbor and sorting bins are never smaller than the volume per
+    atom, so that the dilute boxes generated here do not need billions of bins.
+
+    Every setting is kept in self.settings, together with the reason it was chosen in
+    self.reasons, and explain() prints them.
+
+
+    Parameters
+    ----------
+    cutoffs
+        A dictionary from the pair of atom types (i, j), with i <= j, to their pair cutoff.
+    counts
+        A dictionary from atom type to its number of atoms.
+    masses
+        A dictionary from atom type to its mass.
+    volume
+        Volume of the box.
+    nmonomers
+        Number of monomers per chain.
+    temperature
+        Temperature of the Langevin thermostat.
+    damp
+        Damping time of the Langevin thermostat.
+    time_step
+        Time step of the runs.
+    bond_length
+        Largest length of a bond (R0 of the FENE bonds).
+    overrides
+        Optional dictionary replacing any of "skin", "balance", "balance_threshold" and "balance_every".
+    """
+
+    def __init__(self, cutoffs, counts, masses, volume, nmonomers, temperature=1.0, damp=1.0, time_step=0.001,
+                 bond_length=1.5, overrides=None):
+        self.cutoffs = cutoffs
+        self.counts = counts
+        self.masses = masses
+        self.volume = volume
+        self.nmonomers = nmonomers
+        self.temperature = temperature
+        self.damp = damp
+        self.time_step = time_step
+        self.bond_length = bond_length
+        self.types = sorted(counts)
+        self.settings = {}
+        self.reasons = {}
+        self.__choose(overrides or {})
+
+    def __set(self, name, value, reason):
+        self.settings[name] = value
+        self.reasons[name] = reason
+
+    def __cutoff(self, i, j):
+        return self.cutoffs[(min(i, j), max(i, j))]
+
+    def __neighbors(self, i, skin):
+        # mean number of atoms within the neighbor list cutoff of an atom of type i
+        return sum(self.counts[j] / self.volume * 4. / 3. * np.pi * (self.__cutoff(i, j) + skin) ** 3.
+                   for j in self.types)
+
+    def __steps_to_move(self, mass, distance):
+        # Langevin diffusion coefficient kT*damp/m of a body of the given mass
+        diffusion = self.temperature * self.damp / mass
+        return distance ** 2. / (6. * diffusion) / self.time_step
+
+    def __choose(self, overrides):
+        skin = overrides.get("skin", 0.4)
+        self.__set("skin", skin, "neighbor skin of {} bead diameters: the lists are checked every step, so the skin "
+                   "only has to cover the bead motion between rebuilds, not the obstacle size".format(skin))
+        present = [t for t in self.types if self.counts[t] > 0]
+        multi = len(present) > 1 and max(self.cutoffs.values()) > 2. * min(self.cutoffs.values())
+        self.__set("neighbor_style", "multi" if multi else "bin",
+                   "cutoffs from {:.3g} to {:.3g}: per-type bins and stencils".format(min(self.cutoffs.values()), max(self.cutoffs.values()))
+                   if multi else "a single cutoff scale: standard binning")
+        self.__set("neigh_modify", "every 1 delay 0 check yes",
+                   "rebuild only when an atom has moved half the skin, checked every step")
+        # LAMMPS bins by half the smallest neighbor cutoff, and stops when the bins do not fit in an int
+        smallest = min(self.cutoffs.values()) + skin
+        per_atom = (self.volume / max(sum(self.counts.values()), 1)) ** (1. / 3.)
+        binsize = round(max(smallest / 2., per_atom), 4)
+        self.__set("binsize", binsize, "half the smallest neighbor cutoff ({:.3g}), or the side of the volume per atom "
+                   "({:.3g}) when larger: at most about one bin per atom".format(smallest / 2., per_atom))
+
+        ghost = {}
+        for i in self.types:
+            reach = max(self.__cutoff(i, j) for j in self.types)
+            if i == self.types[0]:
+                # the bonded partners of a bead must be ghosts too, even during the short ranged push-off
+                reach = max(reach, self.bond_length)
+            ghost[i] = reach + skin
+        self.__set("ghost_cutoffs", ghost, "largest pair cutoff (or FENE R0 for beads) of each type plus the skin")
+
+        # a bead or an obstacle costs about one unit plus its pairs; beads also have one bond
+        cost = {t: 1. + self.__neighbors(t, skin) + (1. if t == self.types[0] else 0.) for t in self.types}
+        weights = {t: cost[t] / cost[self.types[0]] for t in self.types}
+        self.__set("weights", weights, "relative cost per atom from the expected number of neighbors: "
+                   + ", ".join("type {} {:.3g}".format(t, weights[t]) for t in self.types))
+
+        threshold = overrides.get("balance_threshold", 1.1)
+        self.__set("balance_threshold", threshold, "rebalance when the most loaded subdomain has {}x the mean load".format(threshold))
+        # the load moves with the slowest carrier that is present: chain centers of mass, or obstacles
+        movers = [self.__steps_to_move(self.masses[self.types[0]] * self.nmonomers, skin)]
+        movers += [self.__steps_to_move(self.masses[t], skin) for t in present[1:]]
+        every = overrides.get("balance_every", int(np.clip(1000 * np.ceil(min(movers) / 1000.), 1000, 100000)))
+        self.__set("balance_every", every, "about the number of steps a chain or an obstacle takes to diffuse one skin")
+        self.__set("balance", overrides.get("balance", True),
+                   "the beads are clustered in chains and excluded from the obstacles, so uniform subdomains are unbalanced")
+
+    def commands(self, groups=None):
+        """
+        LAMMPS commands applying the profile, to be written after the atoms exist (the number
+        of types must be known). groups maps each atom type present to a group name, and enables
+        the static and dynamic balancing, weighted by group when there is more than one.
+        """
+        lines = []
+        if self.settings["neighbor_style"] == "multi":
+            # with neighbor multi, binsize sets the bins of the smallest collection, the beads
+            lines.append("neigh_modify {} binsize {} collection/type {} {}".format(self.settings["neigh_modify"], self.settings["binsize"],
+                                                                               len(self.types), " ".join(str(t) for t in self.types)))
+            cutoffs = " ".join("cutoff/multi {} {:.6g}".format(k + 1, self.settings["ghost_cutoffs"][t])
+                               for k, t in enumerate(self.types))
+            lines.append("comm_modify mode multi {}".format(cutoffs))
+        else:
+            lines.append("neigh_modify {} binsize {}".format(self.settings["neigh_modify"], self.settings["binsize"]))
+            lines.append("comm_modify cutoff {:.6g}".format(max(self.settings["ghost_cutoffs"].values())))
+
+        if groups is not None and self.settings["balance"]:
+            weight = ""
+            if len(groups) > 1:
+                weight = " weight group {} {}".format(len(groups), " ".join("{} {:.4g}".format(groups[t], self.settings["weights"][t])
+                                                                          for t in sorted(groups)))
+            threshold = self.settings["balance_threshold"]
+            lines.append("balance {} shift xyz 20 {}{}".format(threshold, threshold, weight))
+            lines.append("fix balance_dynamic all balance {} {} shift xyz 10 {}{}".format(self.settings["balance_every"],
+                                                                                       threshold, threshold, weight))
+        return "".join(line + " \n" for line in lines)
+
+    def explain(self):
+        """Text with every setting of the profile and the reason it was chosen."""
+        return "\n".join("{}: {} -- {}".format(name, self.settings[name], self.reasons[name]) for name in self.settings)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import socket
+import tempfile
+
+import numpy as np
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class EquilibratedStateCache:
+    """
+    This is the class EquilibratedStateCache. It keeps, in a local directory, the polymer states
+    that have gone through the push-off and minimization, so that simulations that only differ
+    in what comes after (e.g. phi_hs) start from the same checkpoint instead of repeating them.
+
+    Every state lives in its own directory, named after the hash of the parameters that
+    determine it, with an entry.json describing it. The state is "pending" until the prepare
+    script in that directory has been run and has written its checkpoint, and "equilibrated"
+    afterwards. A state being written is owned by the process that claimed it, recorded in
+    claim.lock; a directory without entry.json whose owner died on this host is claimed again.
+
+
+    Parameters
+    ----------
+    directory
+        Directory of the cache. It is created if needed.
+    """
+
+    checkpoint = "state.data"
+    restart = "state.restart"
+    prepare_script = "lammps_prepare.in"
+    lock = "claim.lock"
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(parameters):
+        """Hash of the parameters that determine a state."""
+        content = json.dumps(parameters, sort_keys=True, default=_json_default)
+        return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+    def path(self, key, name=""):
+        """Path of a file in the directory of a state."""
+        return os.path.join(self.directory, key, name)
+
+    def status(self, key):
+        """ "equilibrated", "pending", or None if the state is not in the cache."""
+        if os.path.exists(self.path(key, self.checkpoint)):
+            return "equilibrated"
+        if os.path.exists(self.path(key, "entry.json")):
+            return "pending"
+        return None
+
+    def claim(self, key):
+        """
+        Takes the ownership of a new state, atomically: True if this process must prepare the
+        state, False if it is registered already or owned by a live process. The owner (host
+        and pid) is written in the lock file of the state until it is registered, so that the
+        state of a process that died before registering it can be claimed again.
+        """
+        os.makedirs(self.path(key), exist_ok=True)
+        for attempt in range(2):
+            if os.path.exists(self.path(key, "entry.json")):
+                return False
+            temporary = self.temporary(key, self.lock)
+            with open(temporary, "w") as flock:
+                json.dump({"host": socket.gethostname(), "pid": os.getpid()}, flock)
+            try:
+                # a hard link never replaces an existing lock, and the lock is complete when it appears
+                os.link(temporary, self.path(key, self.lock))
+                return True
+            except FileExistsError:
+                owner = self.__owner(self.path(key, self.lock))
+                if attempt or owner is None or not self.__dead(owner):
+                    return False
+                # only one of the processes finding the lock stale moves it away; a lock taken
+                # meanwhile by a live process is put back
+                try:
+                    os.rename(self.path(key, self.lock), temporary + ".stale")
+                except FileNotFoundError:
+                    return False
+                if self.__owner(temporary + ".stale") != owner:
+                    try:
+                        os.link(temporary + ".stale", self.path(key, self.lock))
+                    except FileExistsError:
+                        pass
+                    os.remove(temporary + ".stale")
+                    return False
+                os.remove(temporary + ".stale")
+            finally:
+                os.remove(temporary)
+        return False
+
+    @staticmethod
+    def __owner(lock):
+        try:
+            with open(lock) as flock:
+                return json.load(flock)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def __dead(owner):
+        # only the processes of this host can be checked
+        if owner["host"] != socket.gethostname():
+            return False
+        try:
+            os.kill(owner["pid"], 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    def temporary(self, key, name):
+        """A new temporary file, unique to the caller, next to the file name of a state."""
+        descriptor, temporary = tempfile.mkstemp(prefix=name+".", suffix=".tmp", dir=self.path(key))
+        os.close(descriptor)
+        # mkstemp makes the file private; the states are read by LAMMPS and other users of the cache
+        os.chmod(temporary, 0o644)
+        return temporary
+
+    def register(self, key, parameters):
+        """Records a new pending state. Its directory must already hold the prepare script."""
+        os.makedirs(self.path(key), exist_ok=True)
+        entry = {"key": key, "parameters": parameters, "prepare_script": self.prepare_script,
+                 "checkpoint": self.checkpoint, "restart": self.restart}
+        temporary = self.temporary(key, "entry.json")
+        with open(temporary, "w") as fentry:
+            json.dump(entry, fentry, indent=2, default=_json_default)
+        os.replace(temporary, self.path(key, "entry.json"))
+        if os.path.exists(self.path(key, self.lock)):
+            os.remove(self.path(key, self.lock))
+
+    def index(self):
+        """
+        Scans the cache and writes index.json, a dictionary from key to the parameters and
+        status of every state, which is also returned.
+        """
+        index = {}
+        for key in sorted(os.listdir(self.directory)):
+            if not os.path.exists(self.path(key, "entry.json")):
+                continue
+            with open(self.path(key, "entry.json")) as fentry:
+                entry = json.load(fentry)
+            entry["status"] = self.status(key)
+            index[key] = entry
+
+        descriptor, temporary = tempfile.mkstemp(prefix="index.json.", suffix=".tmp", dir=self.directory)
+        os.close(descriptor)
+        with open(temporary, "w") as findex:
+            json.dump(index, findex, indent=2)
+        os.replace(temporary, os.path.join(self.directory, "index.json"))
+        return index
+
+    def pending(self):
+        """Prepare scripts of the states that are not equilibrated yet."""
+        return [self.path(key, entry["prepare_script"]) for key, entry in self.index().items()
+                if entry["status"] == "pending"]
@@ -0,0 +1,148 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lib.lammps_generator import PolymerSimulation
+from lib.partitions import write_partition_script
+
+
+def point_filename(filename, point):
+    """
+    Builds the filename of a sweep point from the swept values, for example
+    rho_0_004 and {"phi_hs": 0.05} gives rho_0_004_phi_hs_0_05.
+    """
+    labels = [filename]
+    for key, value in point.items():
+        labels.append(key + "_" + str(np.round(value, 6)).replace(".", "_"))
+    return "_".join(labels)
+
+
+def parameter_grid(system_parameters, grid):
+    """
+    Expands a parameter grid into a list of system parameters dictionaries, one for each
+    combination of the values in grid. The filename of each point is made unique with the
+    swept values.
+
+
+    Parameters
+    ----------
+    system_parameters
+        The dictionary of system parameters shared by all points.
+    grid
+        A dictionary from parameter name (e.g. "phi_hs", "rho_real", "nchain", "nmonomers")
+        to the list of values to be swept.
+    """
+    keys = list(grid)
+    points = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        point = dict(zip(keys, values))
+        parameters = dict(system_parameters)
+        parameters.update(point)
+        parameters["filename"] = point_filename(system_parameters["filename"], point)
+        points.append(parameters)
+    return points
+
+
+def _json_default(value):
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    return str(value)
+
+
+def _absolute_paths(system_parameters):
+    # every point runs in its own directory: relative paths are resolved from the caller's, so
+    # that, e.g., all the points share one state cache
+    parameters = dict(system_parameters)
+    if parameters.get("state_cache") is not None:
+        parameters["state_cache"] = os.path.abspath(parameters["state_cache"])
+    if isinstance(parameters.get("tile"), dict) and "data_file" in parameters["tile"]:
+        parameters["tile"] = dict(parameters["tile"], data_file=os.path.abspath(parameters["tile"]["data_file"]))
+    if isinstance(parameters.get("dry_run"), dict) and isinstance(parameters["dry_run"].get("calibration"), str):
+        parameters["dry_run"] = dict(parameters["dry_run"], calibration=os.path.abspath(parameters["dry_run"]["calibration"]))
+    return parameters
+
+
+def _run_point(index, system_parameters, pathto, directory):
+    os.makedirs(directory, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        PolymerSimulation(system_parameters, pathto)
+        files = sorted(name for name in os.listdir(".") if name != "manifest.json")
+        manifest = {
+            "index": index,
+            "directory": directory,
+            "system_parameters": system_parameters,
+            "files": {name: os.path.getsize(name) for name in files},
+        }
+        with open("manifest.json", "w") as fmanifest:
+            json.dump(manifest, fmanifest, indent=2, default=_json_default)
+    finally:
+        os.chdir(cwd)
+    return manifest
+
+
+def run_sweep(system_parameters, grid, pathto, workdir="sweep", processes=None, seed=None, partition_script=None):
+    """
+    Generates the inputs of every point of a parameter grid in parallel. Each point runs in
+    its own scratch directory, workdir/point_<index>, with an independent random stream
+    spawned from seed, so a sweep is reproducible and no two points share def.chain2 or the
+    chain executable. Each directory gets a manifest.json with the parameters and the files
+    produced, and workdir/sweep_manifest.json collects all of them. Relative paths in the
+    system parameters (state_cache, the data_file of tile and the calibration of dry_run) are
+    resolved from the current directory, not from the point directories.
+
+
+    Parameters
+    ----------
+    system_parameters
+        The dictionary of system parameters shared by all points.
+    grid
+        A dictionary from parameter name to the list of values to be swept.
+    pathto
+        A path to the class directory location.
+    workdir
+        Directory where the point directories are created.
+    processes
+        Number of worker processes, by default the number of cores.
+    seed
+        Seed of the sweep. Every point receives its own seed spawned from it.
+    partition_script
+        If given, the name of a script, written in workdir, that runs every replica of every
+        point as a partition of a single LAMMPS launch (see write_partition_script).
+    """
+    points = [_absolute_paths(parameters) for parameters in parameter_grid(system_parameters, grid)]
+    streams = np.random.SeedSequence(seed).spawn(len(points))
+    for parameters, stream in zip(points, streams):
+        parameters["seed"] = int(stream.generate_state(1, np.uint64)[0])
+        if partition_script is not None:
+            parameters["script_mode"] = "files"
+
+    pathto = os.path.abspath(pathto)
+    workdir = os.path.abspath(workdir)
+    directories = [os.path.join(workdir, "point_{:03d}".format(index)) for index in range(len(points))]
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        manifests = list(executor.map(_run_point, range(len(points)), points,
+                                      itertools.repeat(pathto), directories))
+
+    with open(os.path.join(workdir, "sweep_manifest.json"), "w") as fmanifest:
+        json.dump({"seed": seed, "grid": grid, "points": manifests}, fmanifest, indent=2, default=_json_default)
+
+    if partition_script is not None:
+        scripts, labels, partition_directories = [], [], []
+        for manifest in manifests:
+            parameters = manifest["system_parameters"]
+            for i in range(parameters["num_files"]):
+                with open(os.path.join(manifest["directory"], "lammps_"+str(parameters["filename"])+"_"+str(i)+".in")) as lmpScript:
+                    scripts.append(lmpScript.read())
+                label = {"point": manifest["index"], "replica": i}
+                label.update({key: _json_default(parameters[key]) if isinstance(parameters[key], np.generic) else parameters[key]
+                              for key in grid})
+                labels.append(label)
+                partition_directories.append(manifest["directory"])
+        write_partition_script(os.path.join(workdir, partition_script), scripts, labels, partition_directories)
+    return manifests
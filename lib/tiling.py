@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def tile_data(data, k, obstacle_type=2):
+    """
+    Replicates a system k x k x k times, as the LAMMPS replicate command does, and returns
+    it in the layout of the generated data files: the box centered at the origin, the beads
+    first, chain by chain, and the obstacles (molecule 0) after them. Molecule IDs and bonds
+    are renumbered copy by copy, and the image flags are those of the tiled box.
+
+
+    Parameters
+    ----------
+    data
+        A system as returned by read_lammps_data, in a cubic box.
+    k
+        Number of copies along each axis.
+    obstacle_type
+        Atom type of the obstacles.
+
+    Returns
+    -------
+    tiled
+        A dictionary with the box_side of the tiled box and the arrays positions, molecule,
+        types, images and bonds, ready for write_lammps_data.
+    """
+    side = data["hi"] - data["lo"]
+    if not np.allclose(side, side[0]):
+        raise ValueError("only cubic boxes can be tiled, the box is {}".format(side))
+    side = side[0]
+    box_side = k * side
+    ncopies = k ** 3
+    shifts = np.stack(np.meshgrid(np.arange(k), np.arange(k), np.arange(k), indexing="ij"), axis=-1).reshape(-1, 3)
+
+    beads = np.flatnonzero(data["types"] != obstacle_type)
+    obstacles = np.flatnonzero(data["types"] == obstacle_type)
+    nbeads, nobstacles = len(beads), len(obstacles)
+
+    # unwrapped positions relative to the lower corner, shifted copy by copy
+    unwrapped = data["positions"] - data["lo"] + data["images"] * side
+    order = np.concatenate((beads, obstacles))
+    copies = unwrapped[order][None, :, :] + shifts[:, None, :] * side
+    # beads of every copy first, then the obstacles of every copy
+    copies = np.concatenate((copies[:, :nbeads].reshape(-1, 3), copies[:, nbeads:].reshape(-1, 3)))
+    images = np.floor(copies / box_side).astype(np.int64)
+    positions = copies - images * box_side - box_side / 2.
+
+    molecule = data["molecule"][beads]
+    nmolecules = molecule.max() if nbeads else 0
+    molecule = np.concatenate(((molecule[None, :] + nmolecules * np.arange(ncopies)[:, None]).ravel(),
+                               np.zeros(ncopies * nobstacles, dtype=np.int64)))
+    types = np.concatenate((np.repeat(data["types"][beads][None, :], ncopies, axis=0).ravel(),
+                            np.full(ncopies * nobstacles, obstacle_type, dtype=np.int64)))
+
+    # new 1-based ID of every atom of every copy
+    index = np.empty(len(order), dtype=np.int64)
+    index[order] = np.arange(len(order))
+    copy = np.arange(ncopies)[:, None]
+    new_id = np.where(index < nbeads, copy * nbeads + index, ncopies * nbeads + copy * nobstacles + index - nbeads) + 1
+    bonds = new_id[:, data["bonds"] - 1].reshape(-1, 2)
+
+    return {"box_side": box_side, "positions": positions, "molecule": molecule, "types": types,
+            "images": images, "bonds": bonds}
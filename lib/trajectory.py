@@ -0,0 +1,170 @@
+import gzip
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def read_frames(path):
+    """
+    Reads a LAMMPS text dump, plain or gzipped, one frame at a time, so that memory is bounded
+    by the size of a frame. The atoms of every frame are sorted by id. An incomplete last
+    frame, as in the dump of a running simulation, is skipped.
+
+    Yields
+    ------
+    frame
+        A dictionary with the step, the box bounds as an array of shape (3, 2), the names of
+        the columns and the atoms as an array of shape (natoms, ncolumns).
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as fdump:
+        while True:
+            line = fdump.readline()
+            if not line.strip():
+                return
+            if not line.startswith(b"ITEM: TIMESTEP"):
+                raise ValueError("{}: expected ITEM: TIMESTEP, found {!r}".format(path, line))
+            step = int(fdump.readline())
+            fdump.readline()
+            natoms = int(fdump.readline())
+            fdump.readline()
+            # the third value of a triclinic box (the tilt) is ignored
+            bounds = [fdump.readline().split()[:2] for axis in range(3)]
+            columns = fdump.readline().decode().split()[2:]
+            if "id" not in columns:
+                return
+            box = np.array(bounds, dtype=np.float64)
+            block = b"".join(itertools.islice(fdump, natoms))
+            atoms = np.fromstring(block, sep=" ") if block.strip() else np.empty(0)
+            if atoms.size != natoms * len(columns):
+                return
+            atoms = atoms.reshape(natoms, len(columns))
+            order = np.argsort(atoms[:, columns.index("id")], kind="stable")
+            yield {"step": step, "box": box, "columns": columns, "atoms": atoms[order]}
+
+
+class TrajectoryAnalyzer:
+    """
+    This is the class TrajectoryAnalyzer. It computes, from the snapshots dumped by the
+    production run, the radius of gyration and the end-to-end vector of every chain, the
+    mean squared displacement of the chain centers of mass, and that of the obstacles. The
+    frames are processed one by one as they are read, so any dump length fits in memory.
+
+    The dump holds wrapped (scaled) coordinates. Each chain is unwrapped along its bonds,
+    using the topology of the data file: atoms 1 to nchain*nmonomers are the beads, chain
+    by chain. The centers of mass and the obstacles are then unwrapped in time, from one
+    frame to the next, which assumes they move less than half a box between frames. All
+    distances are in reduced units.
+
+
+    Parameters
+    ----------
+    nchain
+        Number of chains.
+    nmonomers
+        Number of monomers per chain.
+    """
+
+    def __init__(self, nchain, nmonomers):
+        self.nchain = nchain
+        self.nmonomers = nmonomers
+        self.nbeads = nchain * nmonomers
+        self.reset()
+
+    def reset(self):
+        """Forgets the frames seen so far."""
+        self.previous = {}
+        self.unwrapped = {}
+        self.origin = {}
+        self.series = {"steps": [], "rg": [], "end_to_end": [], "com": [], "com_msd": [], "obstacle_msd": []}
+
+    def __positions(self, frame):
+        columns = frame["columns"]
+        box = frame["box"]
+        if "xs" in columns:
+            where = [columns.index(name) for name in ["xs", "ys", "zs"]]
+            return box[:, 0] + frame["atoms"][:, where] * (box[:, 1] - box[:, 0])
+        where = [columns.index(name) for name in ["x", "y", "z"]]
+        return frame["atoms"][:, where]
+
+    def __displacement(self, name, wrapped, side):
+        # unwraps in time with the minimum image of the displacement since the previous frame
+        if name not in self.previous:
+            self.unwrapped[name] = wrapped.copy()
+            self.origin[name] = wrapped.copy()
+        else:
+            delta = wrapped - self.previous[name]
+            delta -= side * np.rint(delta / side)
+            self.unwrapped[name] += delta
+        self.previous[name] = wrapped
+        return np.mean(np.sum((self.unwrapped[name] - self.origin[name]) ** 2., axis=-1))
+
+    def update(self, frame):
+        """Adds the observables of one frame, as yielded by read_frames."""
+        side = frame["box"][:, 1] - frame["box"][:, 0]
+        positions = self.__positions(frame)
+        beads = positions[:self.nbeads].reshape(self.nchain, self.nmonomers, 3)
+        bonds = np.diff(beads, axis=1)
+        bonds -= side * np.rint(bonds / side)
+        chains = np.concatenate((beads[:, :1], beads[:, :1] + np.cumsum(bonds, axis=1)), axis=1)
+
+        com = chains.mean(axis=1)
+        self.series["steps"].append(frame["step"])
+        self.series["rg"].append(np.sqrt(np.mean(np.sum((chains - com[:, None]) ** 2., axis=2), axis=1)))
+        self.series["end_to_end"].append(chains[:, -1] - chains[:, 0])
+        self.series["com_msd"].append(self.__displacement("com", com, side))
+        self.series["com"].append(self.unwrapped["com"].copy())
+
+        obstacles = positions[self.nbeads:]
+        if "type" in frame["columns"]:
+            obstacles = positions[frame["atoms"][:, frame["columns"].index("type")] == 2]
+        if len(obstacles) > 0:
+            self.series["obstacle_msd"].append(self.__displacement("obstacles", obstacles, side))
+
+    def result(self):
+        """
+        The observables of every frame seen: a dictionary with the steps, rg (nframes, nchain),
+        end_to_end (nframes, nchain, 3), com, the unwrapped centers of mass (nframes, nchain, 3),
+        com_msd (nframes,) and obstacle_msd (nframes,), empty without obstacles.
+        """
+        return {name: np.array(values) for name, values in self.series.items()}
+
+    def analyze(self, path):
+        """Analyzes a whole dump file, from its first frame."""
+        self.reset()
+        for frame in read_frames(path):
+            self.update(frame)
+        return self.result()
+
+
+def _analyze_file(path, nchain, nmonomers):
+    return TrajectoryAnalyzer(nchain, nmonomers).analyze(path)
+
+
+def analyze_replicas(filename, num_files, nchain, nmonomers, directory=".", extension="", processes=None):
+    """
+    Analyzes the dumps of the num_files replicas of a simulation in parallel, one process per
+    replica, and returns the result of TrajectoryAnalyzer for each of them.
+
+    Parameters
+    ----------
+    filename
+        The "filename" of the system parameters.
+    num_files
+        Number of replicas.
+    nchain
+        Number of chains.
+    nmonomers
+        Number of monomers per chain.
+    directory
+        Directory with the dumps.
+    extension
+        Extension of the dumps, ".gz" for gzipped ones.
+    processes
+        Number of worker processes, by default the number of cores.
+    """
+    paths = [os.path.join(directory, "simulation."+str(filename)+"_"+str(i)+"_snap"+extension) for i in range(num_files)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_analyze_file, paths, itertools.repeat(nchain), itertools.repeat(nmonomers)))
@@ -25,9 +25,15 @@ system_parameters = {
         
 simulation = PolymerSimulation(system_parameters,pathto)
 
-# phi_hs = np.arange(0.005,0.31,0.01)
-# print(phi_hs)
-# for phis in phi_hs:
-#     system_parameters.update({'phi_hs': phis})
-#     system_parameters.update({'filename': "rho_0_004_phi_hs_"+str(np.round(phis,3))})
-#     simulation = PolymerSimulation(system_parameters,pathto)        
+# Sweep over phi_hs in parallel, each point in its own directory under sweep_rho_0_004/
+# from lib.sweep import run_sweep
+# system_parameters.update({'filename': "rho_0_004"})
+# run_sweep(system_parameters, {'phi_hs': np.arange(0.005,0.31,0.01)}, pathto, workdir="sweep_rho_0_004", seed=2020)
+
+# Read back the replicas once LAMMPS has run, e.g. the chain centers of mass
+# from lib.analysis import read_replicas
+# com = read_replicas(system_parameters["filename"], "com_poly", system_parameters["num_files"])
+# or analyze the dumped snapshots offline, one process per replica
+# from lib.trajectory import analyze_replicas
+# results = analyze_replicas(system_parameters["filename"], system_parameters["num_files"],
+#                            system_parameters["nchain"], system_parameters["nmonomers"])
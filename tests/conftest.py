@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import the package as lib, like the scripts and benchmarks, from the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
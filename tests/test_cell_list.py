@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from lib.cell_list import CellList
+
+
+def brute_force(points, stored, box_side, radius):
+    delta = stored[None, :, :] - points[:, None, :]
+    delta -= box_side * np.rint(delta / box_side)
+    distance = np.linalg.norm(delta, axis=2)
+    query_index, point_index = np.nonzero(distance < radius)
+    return set(zip(query_index.tolist(), point_index.tolist()))
+
+
+@pytest.mark.parametrize("box_side, cutoff", [(10., 1.), (10., 2.5), (3., 1.2), (10., 10.)])
+def test_query_matches_brute_force(box_side, cutoff):
+    rng = np.random.default_rng(11)
+    cells = CellList(box_side, cutoff)
+    stored = rng.uniform(-box_side / 2., box_side / 2., (500, 3))
+    # inserted in two batches, and with points on the box faces
+    stored[:3] = -box_side / 2.
+    cells.insert(stored[:200])
+    cells.insert(stored[200:])
+    points = rng.uniform(-box_side / 2., box_side / 2., (300, 3))
+    query_index, point_index, distance = cells.query(points, cutoff, block=64)
+    assert set(zip(query_index.tolist(), point_index.tolist())) == brute_force(points, stored, box_side, cutoff)
+    assert len(set(zip(query_index.tolist(), point_index.tolist()))) == len(query_index)
+    assert np.all(distance < cutoff)
+
+
+def test_pairs_and_overlaps():
+    rng = np.random.default_rng(2)
+    cells = CellList(8., 1.)
+    stored = rng.uniform(-4., 4., (400, 3))
+    cells.insert(stored)
+    first, second, _ = cells.pairs(1.)
+    expected = {(i, j) for i, j in brute_force(stored, stored, 8., 1.) if i < j}
+    assert set(zip(first.tolist(), second.tolist())) == expected
+
+    points = rng.uniform(-4., 4., (100, 3))
+    near = {i for i, j in brute_force(points, stored, 8., 0.5)}
+    np.testing.assert_array_equal(np.flatnonzero(cells.overlaps(points, 0.5)), sorted(near))
+
+
+def test_radius_larger_than_cells():
+    cells = CellList(10., 1.)
+    with pytest.raises(ValueError):
+        cells.query(np.zeros((1, 3)), 2.)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from lib.chain_generator import ChainGenerator
+
+
+def unwrapped(generator, positions, images):
+    return (positions + images * generator.box_side).reshape(generator.nchain, generator.nmonomers, 3)
+
+
+@pytest.mark.parametrize("excluded_cutoff", [None, 0.9])
+def test_bond_length_and_restriction(excluded_cutoff):
+    generator = ChainGenerator(20, 50, 0.3, 0.97, 1.02, seed=5, excluded_cutoff=excluded_cutoff)
+    positions, molecule, images = generator.generate(2)
+    assert positions.shape == (2, generator.natoms, 3)
+    assert np.all(np.abs(positions) <= generator.box_side / 2.)
+    for replica in range(2):
+        chains = unwrapped(generator, positions[replica], images[replica])
+        bonds = np.linalg.norm(np.diff(chains, axis=1), axis=2)
+        np.testing.assert_allclose(bonds, 0.97)
+        # monomers i-1 and i+1 are never closer than restrict
+        assert np.all(np.linalg.norm(chains[:, 2:] - chains[:, :-2], axis=2) > 1.02)
+
+
+def test_excluded_volume_report():
+    generator = ChainGenerator(20, 20, 0.3, seed=17, excluded_cutoff=0.9)
+    positions, molecule, images = generator.generate(2)
+    overlaps = [generator.count_overlaps(replica, 0.9) for replica in positions]
+    assert generator.report["overlaps"] == overlaps
+    assert generator.report["trials"] >= 2 * generator.natoms
+
+
+def test_molecules_and_bonds():
+    generator = ChainGenerator(7, 5, 0.3, seed=1)
+    molecule = generator.molecule_ids()
+    bonds = generator.bonds()
+    assert len(bonds) == 7 * 4
+    np.testing.assert_array_equal(bonds[:, 1] - bonds[:, 0], 1)
+    np.testing.assert_array_equal(molecule[bonds[:, 0] - 1], molecule[bonds[:, 1] - 1])
+    np.testing.assert_array_equal(np.concatenate(list(generator.bond_batches(batch_size=8))), bonds)
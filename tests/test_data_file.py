@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from lib.data_file import DataFileWriter, read_lammps_data, write_lammps_data
+
+
+def system(natoms=1000, seed=3):
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(-50., 50., (natoms, 3))
+    # negative and large values, which set the width of their fields
+    positions[0] = [-49.999999, 0., 49.5]
+    positions[1] = [-1.25e6, 3.5e6, -0.000001]
+    molecule = np.repeat(np.arange(1, natoms // 10 + 1), 10)
+    types = rng.integers(1, 3, natoms)
+    images = rng.integers(-3, 4, (natoms, 3))
+    images[2] = [-123456, 7, 2**31 - 1]
+    first = np.flatnonzero(np.arange(natoms) % 10 < 9) + 1
+    bonds = np.column_stack((first, first + 1))
+    return positions, molecule, types, images, bonds
+
+
+@pytest.mark.parametrize("name", ["system.data", "system.data.gz"])
+def test_round_trip(tmp_path, name):
+    positions, molecule, types, images, bonds = system()
+    path = tmp_path / name
+    write_lammps_data(path, 100., positions, molecule, types, images, bonds, 2, chunk_size=128)
+    data = read_lammps_data(path)
+    np.testing.assert_allclose(data["lo"], -50.)
+    np.testing.assert_allclose(data["hi"], 50.)
+    assert data["n_atom_types"] == 2
+    np.testing.assert_allclose(data["positions"], positions, atol=5e-7)
+    np.testing.assert_array_equal(data["molecule"], molecule)
+    np.testing.assert_array_equal(data["types"], types)
+    np.testing.assert_array_equal(data["images"], images)
+    np.testing.assert_array_equal(data["bonds"], bonds)
+    np.testing.assert_array_equal(data["bond_types"], 1)
+
+
+def test_ids_and_blocks(tmp_path):
+    positions, molecule, types, images, bonds = system(100)
+    order = np.random.default_rng(0).permutation(100)
+    path = tmp_path / "blocks.data"
+    with DataFileWriter(path, 100., 100, len(bonds), 2, masses={1: 1.0, 2: 50.0}, chunk_size=16) as writer:
+        for block in np.array_split(order, 3):
+            writer.atoms(positions[block], molecule[block], types[block], images[block], block + 1)
+        for block in np.array_split(bonds, 4):
+            writer.bonds(block)
+    data = read_lammps_data(path)
+    # the atoms are read back sorted by ID
+    np.testing.assert_allclose(data["positions"], positions, atol=5e-7)
+    np.testing.assert_array_equal(data["bonds"], bonds)
+
+
+def test_declared_counts(tmp_path):
+    positions, molecule, types, images, bonds = system(20)
+    writer = DataFileWriter(tmp_path / "short.data", 100., 20, len(bonds), 2)
+    writer.atoms(positions[:10], molecule[:10], types[:10], images[:10])
+    with pytest.raises(ValueError):
+        writer.bonds(bonds)
+    with pytest.raises(ValueError):
+        writer.close()
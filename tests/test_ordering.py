@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from lib.ordering import curve_bits, curve_keys, reorder_atoms
+
+
+def cell_centers(bits, box_side):
+    side = 2**bits
+    cells = np.stack(np.meshgrid(np.arange(side), np.arange(side), np.arange(side), indexing="ij"), axis=-1).reshape(-1, 3)
+    return cells, (cells + 0.5) * box_side / side - box_side / 2.
+
+
+@pytest.mark.parametrize("bits", [1, 2, 3, 4])
+def test_hilbert_visits_adjacent_cells(bits):
+    cells, centers = cell_centers(bits, 10.)
+    keys = curve_keys(centers, 10., "hilbert", bits)
+    np.testing.assert_array_equal(np.sort(keys), np.arange(len(cells)))
+    # consecutive cells along the curve share a face
+    path = cells[np.argsort(keys)]
+    np.testing.assert_array_equal(np.abs(np.diff(path, axis=0)).sum(axis=1), 1)
+
+
+def test_morton_keys():
+    cells, centers = cell_centers(2, 10.)
+    keys = curve_keys(centers, 10., "morton", 2)
+    np.testing.assert_array_equal(np.sort(keys), np.arange(len(cells)))
+    # the bits of x, y and z are interleaved, x first
+    x, y, z = cells.T
+    expected = sum(((x >> b) & 1) << (3 * b + 2) | ((y >> b) & 1) << (3 * b + 1) | ((z >> b) & 1) << (3 * b)
+                   for b in range(2))
+    np.testing.assert_array_equal(keys, expected)
+
+
+def test_curve_bits():
+    assert curve_bits(100., 1.) == 7
+    assert curve_bits(1., 10.) == 1
+    assert curve_bits(1e9, 1.) == 21
+
+
+@pytest.mark.parametrize("renumber", [False, True])
+def test_reorder_keeps_the_system(renumber):
+    rng = np.random.default_rng(4)
+    positions = rng.uniform(-5., 5., (60, 3))
+    molecule = np.repeat(np.arange(1, 7), 10)
+    types = np.ones(60, dtype=np.int64)
+    images = rng.integers(-1, 2, (60, 3))
+    bonds = np.column_stack((np.arange(1, 60), np.arange(2, 61)))
+    reordered = reorder_atoms(positions, molecule, types, images, bonds, 10., "hilbert", 1., renumber)
+    ids = reordered["ids"]
+    # the atom with ID n after reordering is the same atom as the bonded one before
+    old = np.empty(60, dtype=np.int64)
+    if renumber:
+        old[ids - 1] = np.argsort(curve_keys(positions, 10., "hilbert", curve_bits(10., 1.)), kind="stable")
+    else:
+        old[ids - 1] = ids - 1
+    new_positions = np.empty_like(positions)
+    new_positions[ids - 1] = reordered["positions"]
+    np.testing.assert_array_equal(new_positions, positions[old])
+    np.testing.assert_array_equal(old[reordered["bonds"] - 1], bonds - 1)
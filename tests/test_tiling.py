@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from lib.chain_generator import ChainGenerator
+from lib.tiling import tile_data
+
+
+def source_system(nobstacles=5):
+    generator = ChainGenerator(4, 6, 0.05, seed=9)
+    positions, molecule, images = generator.generate(1)
+    half = generator.box_side / 2.
+    obstacles = np.random.default_rng(1).uniform(-half, half, (nobstacles, 3))
+    # the obstacles first, so that the tiling has to move them after the beads
+    return {
+        "lo": np.full(3, -half),
+        "hi": np.full(3, half),
+        "positions": np.concatenate((obstacles, positions[0])),
+        "molecule": np.concatenate((np.zeros(nobstacles, dtype=np.int64), molecule)),
+        "types": np.concatenate((np.full(nobstacles, 2), np.ones(generator.natoms, dtype=np.int64))),
+        "images": np.concatenate((np.zeros((nobstacles, 3), dtype=np.int64), images[0])),
+        "bonds": generator.bonds() + nobstacles,
+    }, generator
+
+
+@pytest.mark.parametrize("k", [1, 2, 3])
+def test_tiled_bonds_and_ids(k):
+    data, generator = source_system()
+    tiled = tile_data(data, k)
+    ncopies = k**3
+    nbeads = ncopies * generator.natoms
+    assert len(tiled["positions"]) == ncopies * (generator.natoms + 5)
+    np.testing.assert_allclose(tiled["box_side"], k * generator.box_side)
+    assert np.all(np.abs(tiled["positions"]) <= tiled["box_side"] / 2. + 1e-9)
+
+    # the beads first, chain by chain, then the obstacles
+    np.testing.assert_array_equal(tiled["types"][:nbeads], 1)
+    np.testing.assert_array_equal(tiled["types"][nbeads:], 2)
+    np.testing.assert_array_equal(tiled["molecule"][nbeads:], 0)
+    np.testing.assert_array_equal(tiled["molecule"][:nbeads], np.repeat(np.arange(1, ncopies * generator.nchain + 1), generator.nmonomers))
+
+    bonds = tiled["bonds"]
+    assert len(bonds) == ncopies * len(data["bonds"])
+    assert bonds.min() >= 1 and bonds.max() <= nbeads
+    np.testing.assert_array_equal(bonds[:, 1] - bonds[:, 0], 1)
+    np.testing.assert_array_equal(tiled["molecule"][bonds[:, 0] - 1], tiled["molecule"][bonds[:, 1] - 1])
+    unwrapped = tiled["positions"] + tiled["images"] * tiled["box_side"]
+    np.testing.assert_allclose(np.linalg.norm(unwrapped[bonds[:, 1] - 1] - unwrapped[bonds[:, 0] - 1], axis=1), 0.97)
+
+
+def test_only_cubic_boxes():
+    data, generator = source_system()
+    data["hi"] = data["hi"] + np.array([0., 0., 1.])
+    with pytest.raises(ValueError):
+        tile_data(data, 2)